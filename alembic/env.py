@@ -1,7 +1,8 @@
+import asyncio
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
@@ -20,13 +21,21 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 
 from saluki.models import *
-from saluki.dependencies.database import Base, SQLALCHEMY_DATABASE_URL  # noqa
+from saluki.config import settings
+from saluki.dependencies.database import Base, get_async_database_url  # noqa
 
 target_metadata = Base.metadata
 
 
 def get_url():
-    return SQLALCHEMY_DATABASE_URL
+    return settings.sqlalchemy_database_url
+
+
+def include_name(name, type_, parent_names):
+    # The SQLite full-text search tables are managed by hand, not by the models
+    if type_ == "table":
+        return not name.startswith("datafiles_fts")
+    return True
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -50,6 +59,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -58,28 +68,41 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode.
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection, target_metadata=target_metadata,
+        include_name=include_name,
+    )
 
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
+    with context.begin_transaction():
+        context.run_migrations()
 
-    """
+
+async def run_async_migrations() -> None:
+    # Migrate through the async driver the API uses, e.g. asyncpg, so that no
+    # sync driver needs to be installed as well
     configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = get_url()
-    connectable = engine_from_config(
+    configuration["sqlalchemy.url"] = get_async_database_url()
+    connectable = async_engine_from_config(
         configuration,
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode.
+
+    In this scenario we need to create an Engine
+    and associate a connection with the context.
 
-        with context.begin_transaction():
-            context.run_migrations()
+    """
+    asyncio.run(run_async_migrations())
 
 
 if context.is_offline_mode():
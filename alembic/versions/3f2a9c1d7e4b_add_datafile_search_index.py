@@ -0,0 +1,63 @@
+"""Add datafile search index
+
+Revision ID: 3f2a9c1d7e4b
+Revises: ba0647888258
+Create Date: 2026-10-18 14:05:31.842177
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7e4b'
+down_revision: Union[str, None] = 'ba0647888258'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_datafiles_search ON datafiles USING gin "
+            "(to_tsvector('english', slug || ' ' || description))"
+        )
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE datafiles_fts USING fts5("
+            "slug, description, content='datafiles', content_rowid='id')"
+        )
+        op.execute(
+            "CREATE TRIGGER datafiles_fts_insert AFTER INSERT ON datafiles BEGIN "
+            "INSERT INTO datafiles_fts(rowid, slug, description) "
+            "VALUES (new.id, new.slug, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER datafiles_fts_delete AFTER DELETE ON datafiles BEGIN "
+            "INSERT INTO datafiles_fts(datafiles_fts, rowid, slug, description) "
+            "VALUES ('delete', old.id, old.slug, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER datafiles_fts_update AFTER UPDATE OF slug, description "
+            "ON datafiles BEGIN "
+            "INSERT INTO datafiles_fts(datafiles_fts, rowid, slug, description) "
+            "VALUES ('delete', old.id, old.slug, old.description); "
+            "INSERT INTO datafiles_fts(rowid, slug, description) "
+            "VALUES (new.id, new.slug, new.description); END"
+        )
+        # Index the data files that already exist
+        op.execute("INSERT INTO datafiles_fts(datafiles_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_datafiles_search', table_name='datafiles')
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER datafiles_fts_update")
+        op.execute("DROP TRIGGER datafiles_fts_delete")
+        op.execute("DROP TRIGGER datafiles_fts_insert")
+        op.execute("DROP TABLE datafiles_fts")
@@ -0,0 +1,33 @@
+"""Add datafile filter indexes
+
+Revision ID: 8c41d5e0b6a2
+Revises: 3f2a9c1d7e4b
+Create Date: 2026-10-18 15:22:09.517346
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d5e0b6a2'
+down_revision: Union[str, None] = '3f2a9c1d7e4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_datafiles_status_type_start_date', 'datafiles', ['status', 'type', 'start_date'], unique=False)
+    op.create_index('ix_datafiles_type_end_date', 'datafiles', ['type', 'end_date'], unique=False)
+    # Both are covered by the leading columns of the new indexes
+    op.drop_index('ix_datafiles_type', table_name='datafiles')
+    op.drop_index('ix_datafiles_status', table_name='datafiles')
+
+
+def downgrade() -> None:
+    op.create_index('ix_datafiles_status', 'datafiles', ['status'], unique=False)
+    op.create_index('ix_datafiles_type', 'datafiles', ['type'], unique=False)
+    op.drop_index('ix_datafiles_type_end_date', table_name='datafiles')
+    op.drop_index('ix_datafiles_status_type_start_date', table_name='datafiles')
@@ -0,0 +1,31 @@
+"""Add catalogue version
+
+Revision ID: ba0647888258
+Revises: e1e943473fa5
+Create Date: 2026-10-18 09:12:44.318502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ba0647888258'
+down_revision: Union[str, None] = 'e1e943473fa5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    catalogue_version = op.create_table('catalogue_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalogue_version, [{'id': 1, 'version': 1}])
+
+
+def downgrade() -> None:
+    op.drop_table('catalogue_version')
@@ -0,0 +1,33 @@
+"""Add reverse permission indexes and unique slugs
+
+Revision ID: d7e2f4a91c30
+Revises: 8c41d5e0b6a2
+Create Date: 2026-10-18 16:40:52.203981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e2f4a91c30'
+down_revision: Union[str, None] = '8c41d5e0b6a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_datafile_permissions_data_file_id_user_id', 'datafile_permissions', ['data_file_id', 'user_id'], unique=False)
+    op.create_index('ix_datafiletype_permissions_data_file_type_user_id', 'datafiletype_permissions', ['data_file_type', 'user_id'], unique=False)
+    # Fails if any slugs are duplicated, which need resolving by hand first
+    op.drop_index('ix_datafiles_slug', table_name='datafiles')
+    op.create_index('ix_datafiles_slug', 'datafiles', ['slug'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_datafiles_slug', table_name='datafiles')
+    op.create_index('ix_datafiles_slug', 'datafiles', ['slug'], unique=False)
+    op.drop_index('ix_datafiletype_permissions_data_file_type_user_id', table_name='datafiletype_permissions')
+    op.drop_index('ix_datafile_permissions_data_file_id_user_id', table_name='datafile_permissions')
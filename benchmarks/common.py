@@ -0,0 +1,54 @@
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+from sqlalchemy import insert
+
+
+def use_temporary_database(name: str = "benchmark.db") -> str:
+    """Point the app at a fresh SQLite database; call before importing saluki."""
+    path = os.path.join(tempfile.mkdtemp(prefix="saluki-"), name)
+    os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{path}"
+    # Presigning is local, but boto3 still wants credentials and a region
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("EMAIL_BACKEND", "stub")
+    return path
+
+
+def insert_batched(db, model, rows, batch_size: int = 50_000):
+    """Insert rows for a model from an iterable, in executemany batches."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.execute(insert(model), batch)
+            batch = []
+    if batch:
+        db.execute(insert(model), batch)
+
+
+def summarise(samples: list[float]) -> dict:
+    """Summarise latencies in seconds as milliseconds."""
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        index = min(int(len(ordered) * fraction), len(ordered) - 1)
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def report(results: dict):
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
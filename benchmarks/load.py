@@ -0,0 +1,283 @@
+"""Load test the main API routes against a large seeded catalogue.
+
+Seeds a SQLite database with 100k users, 50k data files and 1M direct and type
+permissions, then drives the app in process with concurrent clients. S3 links
+are presigned locally with dummy credentials and emails go to the stub
+transport, so nothing leaves the machine.
+
+    python -m benchmarks.load [--requests N] [--concurrency N] [--scale F]
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import subprocess
+import time
+
+from benchmarks.common import insert_batched, report, summarise, use_temporary_database
+
+use_temporary_database()
+
+import httpx  # noqa: E402
+
+from saluki.dependencies.database import Base, DBSession, engine  # noqa: E402
+from saluki.dependencies.security import create_access_token  # noqa: E402
+from saluki.enums import DataFileStatus, DataFileType, UserLevel  # noqa: E402
+from saluki.main import app  # noqa: E402
+from saluki.models import (  # noqa: E402
+    DBDataFile,
+    DBDataFilePermission,
+    DBDataFileTypePermission,
+    DBUser,
+)
+from saluki.utils.passwords import hash_password  # noqa: E402
+from saluki.utils.permissions import permission_index  # noqa: E402
+
+USERS = 100_000
+DATAFILES = 50_000
+# With one type grant each, users hold 1M permissions in all
+DIRECT_GRANTS_PER_USER = 9
+PASSWORD = "benchmark"
+# Tokens are made for a sample of users, spread across the whole table
+SAMPLED_USERS = 1000
+SEED = 2024
+
+TYPES = list(DataFileType)
+
+
+class Dataset:
+    """The seeded catalogue, and enough about it to make valid requests."""
+
+    def __init__(self, users: int, datafiles: int):
+        self.users = users
+        self.datafiles = datafiles
+        self.first_user_id = None
+        self.staff_token = None
+        self.user_tokens: list[tuple[int, str]] = []
+
+    def seed(self):
+        Base.metadata.create_all(engine)
+        # Hashing is deliberately slow, so every user shares one hash
+        password = hash_password(PASSWORD)
+        with DBSession() as db:
+            staff = DBUser(
+                email="staff@example.org",
+                name="Staff",
+                password=password,
+                user_level=UserLevel.staff,
+                is_active=True,
+            )
+            db.add(staff)
+            db.flush()
+            self.first_user_id = staff.id + 1
+            insert_batched(
+                db,
+                DBUser,
+                (
+                    {
+                        "email": self.email(i),
+                        "name": f"User {i}",
+                        "password": password,
+                        "user_level": UserLevel.user,
+                        "is_active": True,
+                    }
+                    for i in range(self.users)
+                ),
+            )
+            insert_batched(db, DBDataFile, map(self.datafile, range(self.datafiles)))
+            stride = self.datafiles // DIRECT_GRANTS_PER_USER
+            insert_batched(
+                db,
+                DBDataFilePermission,
+                (
+                    {
+                        "user_id": self.first_user_id + i,
+                        "data_file_id": 1 + (i * 7 + k * stride) % self.datafiles,
+                    }
+                    for i in range(self.users)
+                    for k in range(DIRECT_GRANTS_PER_USER)
+                ),
+            )
+            insert_batched(
+                db,
+                DBDataFileTypePermission,
+                (
+                    {
+                        "user_id": self.first_user_id + i,
+                        "data_file_type": self.user_type(i),
+                    }
+                    for i in range(self.users)
+                ),
+            )
+            db.commit()
+
+            self.staff_token = create_access_token(staff)
+            step = max(self.users // SAMPLED_USERS, 1)
+            for i in range(0, self.users, step):
+                user = db.get(DBUser, self.first_user_id + i)
+                self.user_tokens.append((i, create_access_token(user)))
+
+    @staticmethod
+    def email(i: int) -> str:
+        return f"user-{i}@example.org"
+
+    @staticmethod
+    def user_type(i: int) -> DataFileType:
+        return TYPES[i % len(TYPES)]
+
+    @staticmethod
+    def datafile(i: int) -> dict:
+        start = datetime.date(2015, 1, 1) + datetime.timedelta(days=i % 3650)
+        return {
+            "slug": f"datafile-{i}",
+            "description": f"Benchmark data file {i}",
+            "type": TYPES[i % len(TYPES)],
+            "record_count": i * 1000,
+            "start_date": start,
+            "end_date": start + datetime.timedelta(days=30),
+            "status": DataFileStatus.active,
+            "location": f"s3://pidgraph-data-dumps/datafile-{i}.json",
+            "doi": f"10.5438/{i}",
+        }
+
+    def accessible_slug(self, user: int, chooser: random.Random) -> str:
+        """A data file the user can see through their type grant."""
+        offset = TYPES.index(self.user_type(user))
+        index = chooser.randrange(offset, self.datafiles, len(TYPES))
+        return f"datafile-{index}"
+
+    def size(self) -> dict:
+        return {
+            "users": self.users,
+            "datafiles": self.datafiles,
+            "permissions": self.users * (DIRECT_GRANTS_PER_USER + 1),
+        }
+
+
+def scenarios(dataset: Dataset) -> dict:
+    """Functions making one request of each kind, for a request number."""
+    chooser = random.Random(SEED)
+
+    def as_user(n: int) -> tuple[int, dict]:
+        user, token = dataset.user_tokens[n % len(dataset.user_tokens)]
+        return user, {"Authorization": f"Bearer {token}"}
+
+    async def token(client, n):
+        user, _ = as_user(n)
+        return await client.post(
+            "/token", data={"username": dataset.email(user), "password": PASSWORD}
+        )
+
+    async def list_datafiles(client, n):
+        _, headers = as_user(n)
+        return await client.get("/datafiles/", headers=headers)
+
+    async def get_datafile(client, n):
+        user, headers = as_user(n)
+        slug = dataset.accessible_slug(user, chooser)
+        return await client.get(f"/datafiles/{slug}", headers=headers)
+
+    async def download_datafile(client, n):
+        user, headers = as_user(n)
+        slug = dataset.accessible_slug(user, chooser)
+        return await client.get(f"/datafiles/{slug}/download", headers=headers)
+
+    async def user_permissions(client, n):
+        user, _ = as_user(n)
+        return await client.get(
+            f"/permissions/user/{dataset.email(user)}",
+            headers={"Authorization": f"Bearer {dataset.staff_token}"},
+        )
+
+    return {
+        "POST /token": token,
+        "GET /datafiles/": list_datafiles,
+        "GET /datafiles/{id}": get_datafile,
+        "GET /datafiles/{id}/download": download_datafile,
+        "GET /permissions/user/{id}": user_permissions,
+    }
+
+
+async def drive(client, scenario, requests: int, concurrency: int) -> dict:
+    """Make requests with concurrent clients, returning latencies and throughput."""
+    numbers = iter(range(requests))
+    samples = []
+
+    async def worker():
+        # Workers share the iterator, so each request number is made once
+        for n in numbers:
+            start = time.perf_counter()
+            response = await scenario(client, n)
+            samples.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(
+                    f"{response.request.url} returned {response.status_code}"
+                )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**summarise(samples), "throughput_rps": round(requests / elapsed, 1)}
+
+
+async def wait_for_permission_index(timeout: float = 600) -> float:
+    """Wait for the lifespan's first index build, returning how long it took."""
+    start = time.perf_counter()
+    while not permission_index.ready:
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError("The permission index wasn't built in time")
+        await asyncio.sleep(0.1)
+    return time.perf_counter() - start
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    dataset = Dataset(
+        users=int(USERS * args.scale), datafiles=int(DATAFILES * args.scale)
+    )
+    start = time.perf_counter()
+    dataset.seed()
+    seeded_in = time.perf_counter() - start
+
+    results = {
+        "commit": current_commit(),
+        "dataset": {**dataset.size(), "seed_seconds": round(seeded_in, 1)},
+        "concurrency": args.concurrency,
+        "routes": {},
+    }
+    transport = httpx.ASGITransport(app=app)
+    # Run the app's startup and shutdown as a server would, so the permission
+    # index, email outbox and password hasher are set up as in production
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        index_built_in = await wait_for_permission_index()
+        results["dataset"]["index_seconds"] = round(index_built_in, 1)
+        for name, scenario in scenarios(dataset).items():
+            # Logging in is bound by bcrypt, so fewer requests are made
+            requests = args.token_requests if name == "POST /token" else args.requests
+            # Warm up caches and connections before measuring
+            await drive(client, scenario, args.concurrency, args.concurrency)
+            results["routes"][name] = await drive(
+                client, scenario, requests, args.concurrency
+            )
+    report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--token-requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="fraction of the full dataset"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,163 @@
+"""Measure /permissions/datafile/{id} at 1M grants, with and without the reverse indexes.
+
+    python -m benchmarks.permission_indexes [requests]
+"""
+import asyncio
+import datetime
+import random
+import sys
+import time
+
+from benchmarks.common import insert_batched, report, summarise, use_temporary_database
+
+use_temporary_database()
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from saluki.dependencies.database import Base, DBSession, engine  # noqa: E402
+from saluki.dependencies.security import create_access_token  # noqa: E402
+from saluki.enums import DataFileStatus, DataFileType, UserLevel  # noqa: E402
+from saluki.main import app  # noqa: E402
+from saluki.models import (  # noqa: E402
+    DBDataFile,
+    DBDataFilePermission,
+    DBDataFileTypePermission,
+    DBUser,
+)
+
+USERS = 50_000
+DATAFILES = 10_000
+GRANTS_PER_USER = 20
+# One user in this many is also granted a data file type
+TYPE_GRANT_EVERY = 50
+
+REVERSE_INDEXES = {
+    "ix_datafile_permissions_data_file_id_user_id": (
+        "datafile_permissions (data_file_id, user_id)"
+    ),
+    "ix_datafiletype_permissions_data_file_type_user_id": (
+        "datafiletype_permissions (data_file_type, user_id)"
+    ),
+}
+
+
+def seed() -> str:
+    Base.metadata.create_all(engine)
+    types = list(DataFileType)
+    with DBSession() as db:
+        staff = DBUser(
+            email="staff@example.org",
+            name="Staff",
+            password="-",
+            user_level=UserLevel.staff,
+            is_active=True,
+        )
+        db.add(staff)
+        db.flush()
+        insert_batched(
+            db,
+            DBUser,
+            (
+                {
+                    "email": f"user-{i}@example.org",
+                    "name": f"User {i}",
+                    "password": "-",
+                    "user_level": UserLevel.user,
+                    "is_active": True,
+                }
+                for i in range(USERS)
+            ),
+        )
+        insert_batched(
+            db,
+            DBDataFile,
+            (
+                {
+                    "slug": f"datafile-{i}",
+                    "description": f"Benchmark data file {i}",
+                    "type": types[i % len(types)],
+                    "record_count": 0,
+                    "start_date": datetime.date(2020, 1, 1),
+                    "end_date": datetime.date(2020, 1, 31),
+                    "status": DataFileStatus.active,
+                }
+                for i in range(DATAFILES)
+            ),
+        )
+        first_user = staff.id + 1
+        # Spread each user's grants evenly over the data files
+        stride = DATAFILES // GRANTS_PER_USER
+        insert_batched(
+            db,
+            DBDataFilePermission,
+            (
+                {
+                    "user_id": first_user + i,
+                    "data_file_id": 1 + (i * 7 + k * stride) % DATAFILES,
+                }
+                for i in range(USERS)
+                for k in range(GRANTS_PER_USER)
+            ),
+        )
+        insert_batched(
+            db,
+            DBDataFileTypePermission,
+            (
+                {"user_id": first_user + i, "data_file_type": types[i % len(types)]}
+                for i in range(0, USERS, TYPE_GRANT_EVERY)
+            ),
+        )
+        db.commit()
+        return create_access_token(staff)
+
+
+def set_reverse_indexes(enabled: bool):
+    with engine.begin() as connection:
+        for name, columns in REVERSE_INDEXES.items():
+            if enabled:
+                connection.execute(
+                    text(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+                )
+            else:
+                connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        connection.execute(text("ANALYZE"))
+
+
+async def measure(client: httpx.AsyncClient, token: str, requests: int) -> list[float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    chooser = random.Random(requests)
+    samples = []
+    for _ in range(requests):
+        slug = f"datafile-{chooser.randrange(DATAFILES)}"
+        start = time.perf_counter()
+        response = await client.get(f"/permissions/datafile/{slug}", headers=headers)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return samples
+
+
+async def main(requests: int):
+    token = seed()
+    transport = httpx.ASGITransport(app=app)
+    results = {
+        "users": USERS,
+        "datafiles": DATAFILES,
+        "grants": USERS * GRANTS_PER_USER + USERS // TYPE_GRANT_EVERY,
+    }
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for name, enabled in (("without_indexes", False), ("with_indexes", True)):
+            set_reverse_indexes(enabled)
+            # Warm up caches and connections before measuring
+            await measure(client, token, 3)
+            results[name] = summarise(await measure(client, token, requests))
+    results["speedup"] = round(
+        results["without_indexes"]["mean_ms"] / results["with_indexes"]["mean_ms"], 2
+    )
+    report(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
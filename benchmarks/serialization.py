@@ -0,0 +1,86 @@
+"""Compare the default and fast JSON paths for a 1,000-row data file listing.
+
+    python -m benchmarks.serialization [requests]
+"""
+import asyncio
+import datetime
+import sys
+import time
+
+from benchmarks.common import report, summarise, use_temporary_database
+
+use_temporary_database()
+
+import httpx  # noqa: E402
+
+from saluki.config import settings  # noqa: E402
+from saluki.dependencies.database import Base, DBSession, engine  # noqa: E402
+from saluki.dependencies.security import create_access_token  # noqa: E402
+from saluki.enums import DataFileStatus, DataFileType, UserLevel  # noqa: E402
+from saluki.main import app  # noqa: E402
+from saluki.models import DBDataFile, DBUser  # noqa: E402
+
+ROWS = 1000
+
+
+def seed() -> str:
+    Base.metadata.create_all(engine)
+    with DBSession() as db:
+        editor = DBUser(
+            email="editor@example.org",
+            name="Editor",
+            password="-",
+            user_level=UserLevel.editor,
+            is_active=True,
+        )
+        db.add(editor)
+        db.add_all(
+            DBDataFile(
+                slug=f"datafile-{i}",
+                description=f"Benchmark data file {i}",
+                type=list(DataFileType)[i % len(DataFileType)],
+                record_count=i * 1000,
+                start_date=datetime.date(2020, 1, 1) + datetime.timedelta(days=i),
+                end_date=datetime.date(2020, 1, 2) + datetime.timedelta(days=i),
+                status=DataFileStatus.active,
+                location=f"s3://pidgraph-data-dumps/datafile-{i}.json",
+                doi=f"10.5438/{i}",
+            )
+            for i in range(ROWS)
+        )
+        db.commit()
+        return create_access_token(editor)
+
+
+async def measure(client: httpx.AsyncClient, token: str, requests: int) -> list[float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(f"/datafiles/?limit={ROWS}", headers=headers)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+        assert len(response.json()) == ROWS
+    return samples
+
+
+async def main(requests: int):
+    token = seed()
+    transport = httpx.ASGITransport(app=app)
+    results = {"rows": ROWS}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for name, fast_json in (("default", False), ("fast_json", True)):
+            settings.fast_json = fast_json
+            # Warm up caches and connections before measuring
+            await measure(client, token, 3)
+            results[name] = summarise(await measure(client, token, requests))
+    results["speedup"] = round(
+        results["default"]["mean_ms"] / results["fast_json"]["mean_ms"], 2
+    )
+    report(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -3,6 +3,19 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     sqlalchemy_database_url: str = "sqlite:///./test.db"
+    sqlalchemy_async_database_url: str | None = None
+    # Connection pool settings, used for server databases
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Pragmas applied to every SQLite connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size: int = -65536  # Negative values are in KiB
     secret_key: str = "override-me-in-production"
     jwt_expire_minutes: int = 1440
     confirmation_expire_minutes: int = 1440
@@ -11,6 +24,34 @@ class Settings(BaseSettings):
     mailgun_endpoint: str = "https://api.mailgun.net/v3/mg.datacite.org"
     email_from: str = "DataCite Data Files Service"
     email_address: str = "support@datacite.org"
+    email_backend: str = "mailgun"  # or "stub" to record emails instead of sending
+    email_concurrency: int = 4
+    email_batch_size: int = 50
+    email_max_retries: int = 3
+    email_retry_backoff_seconds: float = 1.0
+    local_data_root: str | None = None  # Serve file:// data files from here
+    s3_bucket: str = "pidgraph-data-dumps"
+    s3_presign_expire_seconds: int = 3600
+    s3_presign_refresh_seconds: int = 300
+    s3_presign_cache_size: int = 100000
+    storage_backend: str = "s3"  # or "local" to use local_storage_root instead
+    local_storage_root: str = "./storage"
+    download_cache_directory: str | None = None  # Cache S3 downloads here if set
+    download_cache_max_bytes: int = 50 * 1024**3
+    upload_part_size: int = 64 * 1024**2  # S3 requires at least 5 MiB
+    upload_concurrency: int = 8
+    permission_index_refresh_seconds: int = 300
+    catalogue_version_ttl_seconds: int = 5
+    fast_json: bool = False  # Serialize listings straight from rows with ujson
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 64
+    token_cache_size: int = 10000
+    token_cache_seconds: int = 300
+    trust_token_claims: bool = False
+    token_claims_max_age_minutes: int = 15
+    query_budget: int = 25  # Warn when a request runs more queries than this
+    query_repeat_limit: int = 5  # Warn when a request repeats a statement this often
+    query_budget_strict: bool = False  # Fail such requests instead, e.g. in tests
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,57 @@
+import hashlib
+import time
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from saluki.config import settings
+from saluki.dependencies.database import get_async_database
+from saluki.dependencies.security import get_current_user
+from saluki.models import catalogue_version
+
+
+class CatalogueETag:
+    """Tags responses with an ETag derived from the catalogue version.
+
+    Used as a route dependency, it answers a matching If-None-Match with a 304
+    before the route does any work. Responses vary by user, so the tag covers
+    the user as well as the request URL. Responses with download links are
+    re-tagged regularly so that clients don't hold on to expired links.
+    """
+
+    def __init__(self, includes_links: bool = False):
+        self.includes_links = includes_links
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        db=Depends(get_async_database),
+        current_user=Depends(get_current_user),
+    ) -> str:
+        parts = [
+            await catalogue_version.get(db),
+            current_user.id,
+            int(current_user.user_level),
+            request.url.path,
+            sorted(request.query_params.multi_items()),
+        ]
+        if self.includes_links or "download_link" in request.url.query:
+            link_lifetime = max(settings.s3_presign_refresh_seconds // 2, 1)
+            parts.append(int(time.time() // link_lifetime))
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+        etag = f'"{digest}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+            "Vary": "Authorization",
+        }
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match == "*" or etag in (
+            t.strip() for t in if_none_match.split(",")
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+            )
+        response.headers.update(headers)
+        return etag
@@ -1,21 +1,152 @@
-from sqlalchemy import create_engine
+import time
+from functools import cache
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from saluki.config import settings
+from saluki.utils.metrics import registry
+
+# Async drivers used for each backend when no async URL is configured
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def get_async_database_url() -> str:
+    """Work out the async database URL, swapping in an async driver if needed."""
+    if settings.sqlalchemy_async_database_url:
+        return settings.sqlalchemy_async_database_url
+    url = make_url(settings.sqlalchemy_database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver:
+        url = url.set(drivername=driver)
+    return url.render_as_string(hide_password=False)
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def get_engine_options(url: str) -> dict:
+    """Engine arguments suited to the database backend."""
+    if is_sqlite(url):
+        # SQLite connections are cheap, so there's no pool to tune
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each new SQLite connection, chiefly so readers aren't blocked by writers."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+    cursor.close()
+
+
+@cache
+def get_engine() -> Engine:
+    """The sync engine, used by scripts, benchmarks and tests.
+
+    It's created on first use, so the API, which only uses the async engine,
+    doesn't need a sync driver such as psycopg2 to be installed.
+    """
+    sync_engine = create_engine(
+        settings.sqlalchemy_database_url,
+        **get_engine_options(settings.sqlalchemy_database_url),
+    )
+    if is_sqlite(settings.sqlalchemy_database_url):
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    return sync_engine
+
+
+@cache
+def get_session_factory() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+def __getattr__(name: str):
+    # Keep engine and DBSession importable as before, without creating them early
+    if name == "engine":
+        return get_engine()
+    if name == "DBSession":
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-engine = create_engine(
-    settings.sqlalchemy_database_url, connect_args={"check_same_thread": False}
+
+# The async engine is used by the API routes
+async_engine = create_async_engine(
+    get_async_database_url(), **get_engine_options(get_async_database_url())
+)
+AsyncDBSession = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+if is_sqlite(get_async_database_url()):
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+
+checkout_duration = registry.histogram(
+    "saluki_db_connection_checkout_seconds",
+    "Time database connections are checked out of the API's pool for.",
+)
+
+
+def record_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+def record_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        checkout_duration.observe(time.perf_counter() - checked_out_at)
+
+
+def pool_connections() -> dict | None:
+    pool = async_engine.sync_engine.pool
+    # Only queue pools keep count; SQLite's StaticPool and NullPool don't
+    if not isinstance(pool, QueuePool):
+        return None
+    return {
+        ("size",): pool.size(),
+        ("checked_out",): pool.checkedout(),
+        ("idle",): pool.checkedin(),
+        ("overflow",): max(pool.overflow(), 0),
+    }
+
+
+event.listen(async_engine.sync_engine, "checkout", record_checkout)
+event.listen(async_engine.sync_engine, "checkin", record_checkin)
+registry.gauge(
+    "saluki_db_pool_connections",
+    "Connections in the API's database pool, by state.",
+    pool_connections,
+    labels=("state",),
 )
-DBSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
 def get_database():
     """Provide a database session for dependency injection."""
-    database = DBSession()
+    database = get_session_factory()()
     try:
         yield database
     finally:
         database.close()
+
+
+async def get_async_database():
+    """Provide an async database session for dependency injection."""
+    async with AsyncDBSession() as database:
+        yield database
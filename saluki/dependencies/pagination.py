@@ -0,0 +1,32 @@
+import base64
+import json
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the id of the last row on a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps([last_id]).encode()).decode()
+
+
+def get_cursor(cursor: str | None = None) -> int | None:
+    """Decode the cursor query parameter into the id to continue after."""
+    if cursor is None:
+        return None
+    try:
+        (last_id,) = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return last_id
+
+
+def set_next_cursor(response: Response, rows: list, limit: int):
+    """Point the client at the next page if this one was full."""
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
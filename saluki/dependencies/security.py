@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta
 
 from fastapi import Depends, HTTPException, status
@@ -5,12 +6,28 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 
 from saluki.config import settings
-from saluki.dependencies.database import get_database
+from saluki.dependencies.database import get_async_database
 from saluki.enums import UserLevel
-from saluki.models import DBUser, get_user_by_email
+from saluki.models import (
+    DBDataFile,
+    DBUser,
+    get_user_by_email,
+    list_datafile,
+    user_can_access,
+)
+from saluki.schemas.users import CurrentUser
+from saluki.utils.cache import token_cache, token_claims_revoked
+from saluki.utils.permissions import permission_index
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
+# Bump when the claims embedded in access tokens change shape
+TOKEN_CLAIMS_VERSION = 1
+
+ANONYMOUS_USER = CurrentUser(
+    name="Anonymous", user_level=UserLevel.anonymous, is_active=True
+)
+
 
 def get_token_user(token: str, action: str = None) -> str | None:
     if token:
@@ -35,8 +52,14 @@ def get_token_user(token: str, action: str = None) -> str | None:
         return None
 
 
-def get_current_user(db=Depends(get_database), token=Depends(oauth2_scheme)) -> DBUser:
+async def get_current_user(
+    db=Depends(get_async_database), token=Depends(oauth2_scheme)
+) -> CurrentUser:
     if token:
+        current_user = token_cache.get(token)
+        if current_user:
+            return current_user
+
         try:
             payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
             email: str = payload.get("sub")
@@ -54,10 +77,13 @@ def get_current_user(db=Depends(get_database), token=Depends(oauth2_scheme)) ->
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        user = get_user_by_email(db=db, email=email)
+        user = await get_user_by_email(db=db, email=email)
         if user:
             if user.is_active:
-                return user
+                current_user = CurrentUser.model_validate(user)
+                # Never cache a token beyond its own expiry
+                token_cache.set(token, current_user, ttl=payload["exp"] - time.time())
+                return current_user
             else:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user"
@@ -67,18 +93,50 @@ def get_current_user(db=Depends(get_database), token=Depends(oauth2_scheme)) ->
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
             )
     else:
-        return DBUser(name="Anonymous", user_level=UserLevel.anonymous, is_active=True)
+        return ANONYMOUS_USER
+
+
+def get_trusted_claims(token: str) -> dict | None:
+    """Return the claims of an access token if they can be trusted without a DB lookup.
+
+    Claims are only trusted for a short time after the token was issued, and not
+    at all once they have been revoked, so demotions take effect quickly.
+    """
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
+    except JWTError:
+        return None
+    if (
+        payload.get("action") != "api"
+        or payload.get("ver") != TOKEN_CLAIMS_VERSION
+        or payload.get("user_id") is None
+        or payload.get("user_level") is None
+    ):
+        return None
+    issued_at = payload.get("iat", 0)
+    if time.time() - issued_at > settings.token_claims_max_age_minutes * 60:
+        return None
+    if token_claims_revoked(payload["user_id"], issued_at):
+        return None
+    return payload
 
 
 class AccessLevelChecker:
-    def __init__(self, required_security_level):
+    def __init__(self, required_security_level, trust_claims: bool | None = None):
         self.required_security_level = required_security_level
+        # Opt in to trusting the signed level claim instead of loading the user
+        if trust_claims is None:
+            trust_claims = settings.trust_token_claims
+        self.trust_claims = trust_claims
 
-    def __call__(self, user=Depends(get_current_user)):
-        if not user:
-            user_level = UserLevel.anonymous
+    async def __call__(
+        self, db=Depends(get_async_database), token=Depends(oauth2_scheme)
+    ):
+        claims = get_trusted_claims(token) if token and self.trust_claims else None
+        if claims:
+            user_level = UserLevel(claims["user_level"])
         else:
-            user_level = user.user_level
+            user_level = (await get_current_user(db=db, token=token)).user_level
         if user_level < self.required_security_level:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,9 +145,44 @@ class AccessLevelChecker:
         return True
 
 
+async def get_accessible_datafile(
+    datafile_id: str,
+    db=Depends(get_async_database),
+    current_user=Depends(get_current_user),
+) -> DBDataFile:
+    """Load a data file by slug, checking the current user is allowed to access it."""
+    datafile = await list_datafile(db=db, slug=datafile_id)
+    if not datafile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Data File not found"
+        )
+    if current_user.user_level >= UserLevel.editor:
+        return datafile
+    if current_user.user_level > UserLevel.anonymous:
+        # The index answers most checks without the database, but may not have
+        # seen a grant made by another worker yet, so a miss is confirmed there
+        if permission_index.ready and permission_index.can_access(
+            current_user.id, datafile
+        ):
+            return datafile
+        if await user_can_access(db=db, user_id=current_user.id, datafile=datafile):
+            return datafile
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions"
+    )
+
+
 def create_access_token(user: DBUser):
     expire = datetime.utcnow() + timedelta(minutes=settings.jwt_expire_minutes)
-    data = {"sub": user.email, "action": "api", "exp": expire}
+    data = {
+        "sub": user.email,
+        "action": "api",
+        "exp": expire,
+        "iat": int(time.time()),
+        "user_id": user.id,
+        "user_level": int(user.user_level),
+        "ver": TOKEN_CLAIMS_VERSION,
+    }
     encoded_jwt = jwt.encode(data, settings.secret_key, algorithm="HS256")
     return encoded_jwt
 
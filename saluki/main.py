@@ -1,12 +1,16 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Annotated
 
 from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse, UJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from routers.datafiles import datafile_router
 from routers.permissions import permissions_router
 from routers.users import user_router
 
-from saluki.dependencies.database import get_database
+from saluki.config import settings
+from saluki.dependencies.database import get_async_database
 from saluki.dependencies.security import (
     AccessLevelChecker,
     create_access_token,
@@ -14,31 +18,66 @@ from saluki.dependencies.security import (
 )
 from saluki.enums import UserLevel
 from saluki.models import get_user_by_email
-from saluki.utils.email import send_email
+from saluki.utils.email import outbox, send_email
+from saluki.utils.metrics import MetricsMiddleware, registry
+from saluki.utils.passwords import PasswordHasherBusy, password_hasher
+from saluki.utils.permissions import refresh_permission_index
+from saluki.utils.queries import QueryCounterMiddleware
+from saluki.utils.storage import download_cache
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    permission_refresh = asyncio.create_task(
+        refresh_permission_index(settings.permission_index_refresh_seconds)
+    )
+    yield
+    permission_refresh.cancel()
+    await outbox.close()
+    password_hasher.shutdown()
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=UJSONResponse if settings.fast_json else JSONResponse,
+)
+
+app.add_middleware(QueryCounterMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(user_router)
 app.include_router(datafile_router)
 app.include_router(permissions_router)
 
 
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "detail": "Too many password operations in progress, try again shortly"
+        },
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.get("/")
 def root():
     return {"message": "Hello World"}
 
 
 @app.post("/token")
-def login(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db=Depends(get_database)
+async def login(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    db=Depends(get_async_database),
 ):
-    user = get_user_by_email(db=db, email=form_data.username)
+    user = await get_user_by_email(db=db, email=form_data.username)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
-    if not user.verify_password(form_data.password):
+    if not await password_hasher.verify(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -53,7 +92,7 @@ def login(
 
 
 @app.get("/test", dependencies=[Depends(AccessLevelChecker(UserLevel.user))])
-def test(user=Depends(get_current_user)):
+async def test(user=Depends(get_current_user)):
     return {
         "response": send_email(user.email, "test mailgun email", "test body"),
     }
@@ -65,3 +104,48 @@ def get_routes(request: Request):
         {"path": route.path, "name": route.name} for route in request.app.routes
     ]
     return url_list
+
+
+registry.gauge(
+    "saluki_password_hash_in_flight",
+    "Password hashes and verifications submitted to the worker pool.",
+    lambda: password_hasher.in_flight,
+)
+registry.gauge(
+    "saluki_password_hash_queue_depth",
+    "Password operations waiting for a free worker.",
+    lambda: password_hasher.queue_depth,
+)
+registry.gauge(
+    "saluki_email_outbox_queue_depth",
+    "Emails waiting to be sent.",
+    lambda: outbox.queue_depth,
+)
+registry.gauge(
+    "saluki_download_cache",
+    "Download cache activity and size, by statistic.",
+    lambda: {(name,): value for name, value in download_cache.stats().items()}
+    if download_cache
+    else None,
+    labels=("statistic",),
+)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/stats", dependencies=[Depends(AccessLevelChecker(UserLevel.staff))])
+def get_stats():
+    return {
+        "password_hasher": {
+            "workers": password_hasher.workers,
+            "in_flight": password_hasher.in_flight,
+            "queue_depth": password_hasher.queue_depth,
+        },
+        "email_outbox": {"queue_depth": outbox.queue_depth},
+        "download_cache": download_cache.stats() if download_cache else None,
+    }
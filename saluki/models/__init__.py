@@ -1,4 +1,5 @@
 """SQLAlchemy models."""
+from saluki.models.catalogue import *
 from saluki.models.datafiles import *
 from saluki.models.permissions import *
 from saluki.models.users import *
@@ -0,0 +1,72 @@
+import time
+
+from sqlalchemy import DDL, Column, Integer, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from saluki.config import settings
+from saluki.dependencies.database import Base
+
+
+class DBCatalogueVersion(Base):
+    """A counter bumped whenever data files, permissions or users change."""
+
+    __tablename__ = "catalogue_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DBCatalogueVersion(version={self.version})>"
+
+
+# Migrations insert the single row, so do the same for databases made with
+# create_all, rather than leaving concurrent first writers to race to insert it
+event.listen(
+    DBCatalogueVersion.__table__,
+    "after_create",
+    DDL("INSERT INTO catalogue_version (id, version) VALUES (1, 1)"),
+)
+
+
+class CatalogueVersionCache:
+    """Caches the catalogue version, so that most reads don't need the database.
+
+    Changes made in this process take effect immediately, while changes made by
+    other workers are picked up within ttl seconds.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._version: int | None = None
+        self._expires = 0.0
+
+    async def get(self, db: AsyncSession) -> int:
+        if self._version is None or self._expires <= time.monotonic():
+            version = await db.scalar(select(DBCatalogueVersion.version).limit(1))
+            self._version = version or 0
+            self._expires = time.monotonic() + self.ttl
+        return self._version
+
+    def expire(self):
+        self._version = None
+
+
+catalogue_version = CatalogueVersionCache(ttl=settings.catalogue_version_ttl_seconds)
+
+
+async def bump_catalogue_version(*, db: AsyncSession):
+    """Bump the catalogue version as part of the session's current transaction."""
+    result = await db.execute(
+        update(DBCatalogueVersion).values(version=DBCatalogueVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(DBCatalogueVersion(id=1, version=1))
+    db.sync_session.info["catalogue_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def expire_catalogue_version(session: Session):
+    # Only expire once the change is visible, so the old version isn't re-cached
+    if session.info.pop("catalogue_changed", False):
+        catalogue_version.expire()
@@ -1,12 +1,52 @@
-import boto3
-from botocore.exceptions import ClientError
-from sqlalchemy import Column, Date, Enum, Integer, String, Text
-from sqlalchemy.orm import Session, relationship
+import datetime
+import re
+
+from sqlalchemy import (
+    DDL,
+    Column,
+    Date,
+    Enum,
+    Index,
+    Integer,
+    Row,
+    Select,
+    String,
+    Text,
+    column,
+    event,
+    exists,
+    false,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    table,
+    union,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import relationship
 
 from saluki.dependencies.database import Base
 from saluki.enums import DataFileStatus, DataFileType
+from saluki.models.catalogue import bump_catalogue_version
 from saluki.models.permissions import DBDataFilePermission, DBDataFileTypePermission
 from saluki.schemas.datafiles import DataFileCreate, DataFileUpdate
+from saluki.utils.s3 import presigner
+
+
+def search_document(slug, description):
+    """The text search vector of a data file, as indexed on Postgres.
+
+    The configuration and separator are literals rather than bound parameters,
+    so that queries match the indexed expression.
+    """
+    return func.to_tsvector(
+        literal_column("'english'"),
+        slug.concat(literal_column("' '")).concat(description),
+    )
 
 
 class DBDataFile(Base):
@@ -15,16 +55,28 @@ class DBDataFile(Base):
     __tablename__ = "datafiles"
 
     id = Column(Integer, primary_key=True)
-    slug = Column(String, nullable=False, index=True)
+    slug = Column(String, nullable=False, index=True, unique=True)
     description = Column(Text, nullable=False)
-    type = Column(Enum(DataFileType), nullable=False, index=True)
+    type = Column(Enum(DataFileType), nullable=False)
     record_count = Column(Integer, nullable=False, default=0)
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
-    status = Column(Enum(DataFileStatus), nullable=False, index=True)
+    status = Column(Enum(DataFileStatus), nullable=False)
     location = Column(String, nullable=True)
     doi = Column(String, nullable=True)
 
+    __table_args__ = (
+        # Listing filters; these also serve lookups on status or type alone
+        Index("ix_datafiles_status_type_start_date", status, type, start_date),
+        Index("ix_datafiles_type_end_date", type, end_date),
+        # Full-text search on Postgres; SQLite uses the FTS5 table defined below
+        Index(
+            "ix_datafiles_search",
+            search_document(slug, description),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
     direct_permissions = relationship("DBDataFilePermission", back_populates="datafile")
 
     type_permissions = relationship(
@@ -37,52 +89,221 @@ class DBDataFile(Base):
     def permissions(self) -> list[DBDataFileTypePermission | DBDataFilePermission]:
         return self.direct_permissions + self.type_permissions
 
+    @property
+    def storage_key(self) -> str | None:
+        """The S3 object key of the data file, if it is stored in S3."""
+        return storage_key(self.location)
+
     @property
     def download_link(self):
         """Generate a download link for the data file."""
-        if self.location[:3] == "s3:":
-            s3_client = boto3.client("s3")
-            try:
-                url = s3_client.generate_presigned_url(
-                    ClientMethod="get_object",
-                    Params={
-                        "Bucket": "pidgraph-data-dumps",
-                        "Key": self.location.rsplit("/", 1)[-1],
-                    },
-                    ExpiresIn=3600,
-                )
-                return url
-            except ClientError as e:
-                # TODO: Add some logging here
-                print(f"Couldn't generate presigned URL: {e}")
-                return None
-        else:
-            return self.location
+        return download_link(self.location)
 
     def __repr__(self):
         return f"<DBDataFile(id={self.id}, slug={self.slug}, type={self.type}, status={self.status})>"
 
 
-def list_datafiles(*, db: Session, skip: int = 0, limit: int = 100) -> list[DBDataFile]:
-    return db.query(DBDataFile).offset(skip).limit(limit).all()
+# SQLite full-text search uses an FTS5 table indexing the slug and description
+# of data files, kept in step with the datafiles table by triggers
+datafiles_fts = table(
+    "datafiles_fts", column("datafiles_fts"), column("rowid"), column("rank")
+)
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE datafiles_fts USING fts5(
+        slug, description, content='datafiles', content_rowid='id'
+    )""",
+    """CREATE TRIGGER datafiles_fts_insert AFTER INSERT ON datafiles BEGIN
+        INSERT INTO datafiles_fts(rowid, slug, description)
+        VALUES (new.id, new.slug, new.description);
+    END""",
+    """CREATE TRIGGER datafiles_fts_delete AFTER DELETE ON datafiles BEGIN
+        INSERT INTO datafiles_fts(datafiles_fts, rowid, slug, description)
+        VALUES ('delete', old.id, old.slug, old.description);
+    END""",
+    """CREATE TRIGGER datafiles_fts_update AFTER UPDATE OF slug, description
+    ON datafiles BEGIN
+        INSERT INTO datafiles_fts(datafiles_fts, rowid, slug, description)
+        VALUES ('delete', old.id, old.slug, old.description);
+        INSERT INTO datafiles_fts(rowid, slug, description)
+        VALUES (new.id, new.slug, new.description);
+    END""",
+]
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(
+        DBDataFile.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    DBDataFile.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS datafiles_fts").execute_if(dialect="sqlite"),
+)
+
+
+def search_terms(q: str) -> str:
+    """Turn free text into an FTS5 query matching every word, as a prefix of the last."""
+    words = re.findall(r"\w+", q)
+    if not words:
+        return ""
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def storage_key(location: str | None) -> str | None:
+    """The S3 object key for a data file location, if it is in S3."""
+    if location and location[:3] == "s3:":
+        return location.rsplit("/", 1)[-1]
+    return None
+
+
+def download_link(location: str | None) -> str | None:
+    """Generate a download link for a data file location."""
+    key = storage_key(location)
+    if key:
+        return presigner.presign(key)
+    else:
+        return location
+
+
+def accessible_datafile_ids(user_id: int):
+    """Select the ids of data files a user can access, via direct or type permissions."""
+    direct = select(DBDataFilePermission.data_file_id).where(
+        DBDataFilePermission.user_id == user_id
+    )
+    by_type = (
+        select(DBDataFile.id)
+        .join(
+            DBDataFileTypePermission,
+            DBDataFileTypePermission.data_file_type == DBDataFile.type,
+        )
+        .where(DBDataFileTypePermission.user_id == user_id)
+    )
+    # UNION rather than UNION ALL so files granted both ways are only returned once
+    return union(direct, by_type)
+
+
+async def user_can_access(
+    *, db: AsyncSession, user_id: int, datafile: DBDataFile
+) -> bool:
+    """Check whether a user has been granted access to a data file, in one query."""
+    direct = exists().where(
+        DBDataFilePermission.user_id == user_id,
+        DBDataFilePermission.data_file_id == datafile.id,
+    )
+    by_type = exists().where(
+        DBDataFileTypePermission.user_id == user_id,
+        DBDataFileTypePermission.data_file_type == datafile.type,
+    )
+    return await db.scalar(select(or_(direct, by_type)))
+
+
+def datafiles_query(
+    *columns,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: int | None = None,
+    user_id: int | None = None,
+    datafile_type: DataFileType | None = None,
+    datafile_status: DataFileStatus | None = None,
+    start_after: datetime.date | None = None,
+    end_before: datetime.date | None = None,
+    search: str | None = None,
+    dialect: str = "sqlite",
+) -> Select:
+    """Build a data file listing query, restricted to those accessible by user_id if given.
+
+    Data files can be filtered by type and status, and to those starting on or
+    after start_after and ending on or before end_before. When searching,
+    results are ordered by relevance and paginated by offset.
+    """
+    query = select(*columns).limit(limit)
+    if datafile_type is not None:
+        query = query.where(DBDataFile.type == datafile_type)
+    if datafile_status is not None:
+        query = query.where(DBDataFile.status == datafile_status)
+    if start_after is not None:
+        query = query.where(DBDataFile.start_date >= start_after)
+    if end_before is not None:
+        query = query.where(DBDataFile.end_date <= end_before)
+    if user_id is not None:
+        query = query.where(DBDataFile.id.in_(accessible_datafile_ids(user_id)))
+    if search is not None:
+        return search_query(query, search, dialect).order_by(DBDataFile.id).offset(skip)
+    query = query.order_by(DBDataFile.id)
+    if after_id is not None:
+        # Keyset pagination: seek past the last id seen instead of using an offset
+        query = query.where(DBDataFile.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query
+
+
+def search_query(query: Select, search: str, dialect: str) -> Select:
+    """Restrict a data file query to those matching a search, most relevant first."""
+    if dialect == "postgresql":
+        terms = func.websearch_to_tsquery(literal_column("'english'"), search)
+        document = search_document(DBDataFile.slug, DBDataFile.description)
+        return query.where(document.op("@@")(terms)).order_by(
+            func.ts_rank(document, terms).desc()
+        )
+    terms = search_terms(search)
+    if not terms:
+        return query.where(false())
+    # FTS5's rank is the bm25 score, where lower is more relevant
+    return (
+        query.join(datafiles_fts, datafiles_fts.c.rowid == DBDataFile.id)
+        .where(datafiles_fts.c.datafiles_fts.match(terms))
+        .order_by(datafiles_fts.c.rank)
+    )
+
+
+async def list_datafiles(*, db: AsyncSession, **filters) -> list[DBDataFile]:
+    query = datafiles_query(DBDataFile, dialect=db.get_bind().dialect.name, **filters)
+    return list(await db.scalars(query))
+
+
+async def list_datafile_rows(
+    *, db: AsyncSession, columns: list[str], **filters
+) -> list[Row]:
+    """List the given columns of data files as plain rows, without loading ORM objects.
+
+    The id is always selected first, so rows can be used for pagination.
+    """
+    selected = [DBDataFile.id, *(getattr(DBDataFile, name) for name in columns)]
+    query = datafiles_query(*selected, dialect=db.get_bind().dialect.name, **filters)
+    return list(await db.execute(query))
 
 
-def list_datafile(*, db: Session, slug: str) -> DBDataFile:
-    return db.query(DBDataFile).filter(DBDataFile.slug == slug).first()
+async def list_datafile(*, db: AsyncSession, slug: str) -> DBDataFile | None:
+    return await db.scalar(select(DBDataFile).where(DBDataFile.slug == slug).limit(1))
 
 
-def create_datafile(*, db: Session, datafile_dict: DataFileCreate) -> DBDataFile:
+def is_duplicate_slug(error: IntegrityError) -> bool:
+    """Whether an integrity error was caused by a data file's slug being taken."""
+    # asyncpg names the violated constraint, while SQLite only gives a message
+    constraint = getattr(error.orig.__cause__, "constraint_name", None)
+    if constraint is not None:
+        return constraint == "ix_datafiles_slug"
+    return "UNIQUE constraint failed: datafiles.slug" in str(error.orig)
+
+
+async def create_datafile(
+    *, db: AsyncSession, datafile_dict: DataFileCreate
+) -> DBDataFile:
     datafile = DBDataFile(**datafile_dict.model_dump())
     # Force the location to be a string rather than Pydantic's AnyURL type
     datafile.location = str(datafile.location)
     db.add(datafile)
-    db.commit()
-    db.refresh(datafile)
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    await db.refresh(datafile)
     return datafile
 
 
-def update_datafile(
-    *, db: Session, datafile: DBDataFile, datafile_dict: DataFileUpdate
+async def update_datafile(
+    *, db: AsyncSession, datafile: DBDataFile, datafile_dict: DataFileUpdate
 ) -> DBDataFile:
     datafile.description = datafile_dict.description
     datafile.type = datafile_dict.type
@@ -93,12 +314,73 @@ def update_datafile(
     datafile.location = str(datafile_dict.location)
     datafile.doi = datafile_dict.doi
 
-    db.commit()
-    db.refresh(datafile)
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    await db.refresh(datafile)
     return datafile
 
 
-def remove_datafile(*, db: Session, datafile: DBDataFile) -> bool:
+async def upsert_datafiles(
+    *, db: AsyncSession, datafile_dicts: list[DataFileCreate]
+) -> dict[str, tuple[int, bool]]:
+    """Create or update many data files by slug, in a single transaction.
+
+    New and existing data files are each written with one batched statement.
+    Returns the id of each slug and whether it was created.
+    """
+    rows = []
+    for datafile_dict in datafile_dicts:
+        row = datafile_dict.model_dump()
+        if row["location"] is not None:
+            row["location"] = str(row["location"])
+        rows.append(row)
+    existing = dict(
+        (
+            await db.execute(
+                select(DBDataFile.slug, DBDataFile.id).where(
+                    DBDataFile.slug.in_([row["slug"] for row in rows])
+                )
+            )
+        ).all()
+    )
+    results = {}
+    new_rows = [row for row in rows if row["slug"] not in existing]
+    if new_rows:
+        created = await db.execute(
+            insert(DBDataFile).returning(DBDataFile.slug, DBDataFile.id), new_rows
+        )
+        results.update((slug, (id, True)) for slug, id in created)
+    changed_rows = [
+        {**row, "id": existing[row["slug"]]} for row in rows if row["slug"] in existing
+    ]
+    if changed_rows:
+        await db.execute(update(DBDataFile), changed_rows)
+        results.update((row["slug"], (row["id"], False)) for row in changed_rows)
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    return results
+
+
+async def remove_datafile(*, db: AsyncSession, datafile: DBDataFile) -> bool:
     datafile.status = DataFileStatus.deleted
-    db.commit()
+    await bump_catalogue_version(db=db)
+    await db.commit()
     return True
+
+
+async def complete_datafile_upload(
+    *,
+    db: AsyncSession,
+    datafile: DBDataFile,
+    location: str,
+    record_count: int | None = None,
+) -> DBDataFile:
+    """Point a data file at its newly uploaded contents and make it available."""
+    datafile.location = location
+    if record_count is not None:
+        datafile.record_count = record_count
+    datafile.status = DataFileStatus.active
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    await db.refresh(datafile)
+    return datafile
@@ -1,9 +1,22 @@
-from sqlalchemy import Column, Enum, ForeignKey, Integer, union_all
+from sqlalchemy import (
+    Column,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    delete,
+    select,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import relationship
 
 from saluki.dependencies.database import Base
 from saluki.enums import DataFileType, PermissionType
+from saluki.models.catalogue import bump_catalogue_version
 from saluki.schemas.permissions import DataFilePermission, DataFileTypePermission
 
 
@@ -19,6 +32,11 @@ class DBDataFilePermission(Base):
 
     datafile = relationship("DBDataFile", back_populates="direct_permissions")
 
+    # The primary key serves lookups by user; this serves lookups by data file
+    __table_args__ = (
+        Index("ix_datafile_permissions_data_file_id_user_id", data_file_id, user_id),
+    )
+
     def __repr__(self):
         return f"<DBDataFilePermission(user_id={self.user_id}, data_file_id={self.data_file_id})>"
 
@@ -39,46 +57,183 @@ class DBDataFileTypePermission(Base):
         primaryjoin="foreign(DBDataFileTypePermission.data_file_type) == DBDataFile.type",
     )
 
+    __table_args__ = (
+        Index(
+            "ix_datafiletype_permissions_data_file_type_user_id",
+            data_file_type,
+            user_id,
+        ),
+    )
+
     def __repr__(self):
         return f"<DBDataFileTypePermission(user_id={self.user_id}, data_file_type={self.data_file_type})>"
 
 
-def get_permission_by_id_and_type(
-    *, db: Session, permission_id: int, permission_type: PermissionType
+async def get_permission_by_id_and_type(
+    *, db: AsyncSession, permission_id: int, permission_type: PermissionType
 ) -> DBDataFileTypePermission | DBDataFilePermission:
     if permission_type == PermissionType.filetype:
-        return (
-            db.query(DBDataFileTypePermission)
-            .filter(DBDataFileTypePermission.id == permission_id)
-            .first()
+        return await db.scalar(
+            select(DBDataFileTypePermission)
+            .where(DBDataFileTypePermission.id == permission_id)
+            .limit(1)
         )
     else:
-        return (
-            db.query(DBDataFilePermission)
-            .filter(DBDataFilePermission.id == permission_id)
-            .first()
+        return await db.scalar(
+            select(DBDataFilePermission)
+            .where(DBDataFilePermission.id == permission_id)
+            .limit(1)
         )
 
 
-def create_permission(
-    *, db: Session, permission_dict: DataFileTypePermission | DataFilePermission
+async def list_datafile_permissions(
+    *, db: AsyncSession, data_file_id: int, data_file_type: DataFileType
+) -> list[DBDataFileTypePermission | DBDataFilePermission]:
+    """List the direct and type permissions that grant access to a data file."""
+    direct = await db.scalars(
+        select(DBDataFilePermission).where(
+            DBDataFilePermission.data_file_id == data_file_id
+        )
+    )
+    by_type = await db.scalars(
+        select(DBDataFileTypePermission).where(
+            DBDataFileTypePermission.data_file_type == data_file_type
+        )
+    )
+    return [*direct, *by_type]
+
+
+async def list_user_permissions(
+    *, db: AsyncSession, user_id: int
+) -> list[DBDataFileTypePermission | DBDataFilePermission]:
+    """List the direct and type permissions granted to a user."""
+    direct = await db.scalars(
+        select(DBDataFilePermission).where(DBDataFilePermission.user_id == user_id)
+    )
+    by_type = await db.scalars(
+        select(DBDataFileTypePermission).where(
+            DBDataFileTypePermission.user_id == user_id
+        )
+    )
+    return [*direct, *by_type]
+
+
+async def create_permission(
+    *, db: AsyncSession, permission_dict: DataFileTypePermission | DataFilePermission
 ) -> DBDataFileTypePermission | DBDataFilePermission:
     if isinstance(permission_dict, DataFileTypePermission):
         permission = DBDataFileTypePermission(**permission_dict.model_dump())
     else:
         permission = DBDataFilePermission(**permission_dict.model_dump())
     db.add(permission)
-    db.commit()
-    db.refresh(permission)
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    await db.refresh(permission)
     return permission
 
 
-def remove_permission(
-    *, db: Session, permission: DataFileTypePermission | DataFilePermission
+async def remove_permission(
+    *, db: AsyncSession, permission: DataFileTypePermission | DataFilePermission
 ) -> bool:
     try:
-        db.delete(permission)
-        db.commit()
+        await db.delete(permission)
+        await bump_catalogue_version(db=db)
+        await db.commit()
         return True
     except SQLAlchemyError as e:
         return False
+
+
+# Rows per bulk statement, keeping each well under the database's limit on bound
+# parameters (32,766 in SQLite, 32,767 in asyncpg)
+BULK_CHUNK_SIZE = 1000
+
+
+def _chunked(rows: list[dict]):
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        yield rows[start : start + BULK_CHUNK_SIZE]
+
+
+def _split_permissions(
+    permission_dicts: list[DataFileTypePermission | DataFilePermission],
+) -> tuple[list[dict], list[dict]]:
+    direct, by_type = [], []
+    for permission_dict in permission_dicts:
+        if isinstance(permission_dict, DataFileTypePermission):
+            by_type.append(permission_dict.model_dump())
+        else:
+            direct.append(permission_dict.model_dump())
+    return direct, by_type
+
+
+def _insert_ignoring_existing(db: AsyncSession, model):
+    dialects = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+    dialect = db.get_bind().dialect.name
+    if dialect not in dialects:
+        raise NotImplementedError(f"Bulk grants aren't supported on {dialect}")
+    return dialects[dialect](model).on_conflict_do_nothing()
+
+
+async def create_permissions(
+    *,
+    db: AsyncSession,
+    permission_dicts: list[DataFileTypePermission | DataFilePermission],
+) -> list[DataFileTypePermission | DataFilePermission]:
+    """Grant many permissions in one transaction, skipping any already granted.
+
+    Returns the permissions that were newly granted.
+    """
+    direct, by_type = _split_permissions(permission_dicts)
+    created = []
+    for chunk in _chunked(direct):
+        rows = await db.execute(
+            _insert_ignoring_existing(db, DBDataFilePermission)
+            .values(chunk)
+            .returning(DBDataFilePermission.user_id, DBDataFilePermission.data_file_id)
+        )
+        created += [DataFilePermission(**row._mapping) for row in rows]
+    for chunk in _chunked(by_type):
+        rows = await db.execute(
+            _insert_ignoring_existing(db, DBDataFileTypePermission)
+            .values(chunk)
+            .returning(
+                DBDataFileTypePermission.user_id,
+                DBDataFileTypePermission.data_file_type,
+            )
+        )
+        created += [DataFileTypePermission(**row._mapping) for row in rows]
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    return created
+
+
+async def remove_permissions(
+    *,
+    db: AsyncSession,
+    permission_dicts: list[DataFileTypePermission | DataFilePermission],
+) -> int:
+    """Revoke many permissions in one transaction, returning how many were removed."""
+    direct, by_type = _split_permissions(permission_dicts)
+    removed = 0
+    for chunk in _chunked(direct):
+        result = await db.execute(
+            delete(DBDataFilePermission).where(
+                tuple_(
+                    DBDataFilePermission.user_id, DBDataFilePermission.data_file_id
+                ).in_([(row["user_id"], row["data_file_id"]) for row in chunk])
+            )
+        )
+        removed += result.rowcount
+    for chunk in _chunked(by_type):
+        result = await db.execute(
+            delete(DBDataFileTypePermission).where(
+                tuple_(
+                    DBDataFileTypePermission.user_id,
+                    DBDataFileTypePermission.data_file_type,
+                ).in_([(row["user_id"], row["data_file_type"]) for row in chunk])
+            )
+        )
+        removed += result.rowcount
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    return removed
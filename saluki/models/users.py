@@ -1,15 +1,16 @@
-from passlib.context import CryptContext
-from sqlalchemy import Boolean, Column, Enum, Integer, String
+from sqlalchemy import Boolean, Column, Enum, Integer, String, select
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import relationship
 
 from saluki.dependencies.database import Base
 from saluki.enums import UserLevel
 from saluki.models import DBDataFile
+from saluki.models.catalogue import bump_catalogue_version
 from saluki.models.permissions import DBDataFilePermission, DBDataFileTypePermission
 from saluki.schemas.users import UserCreate, UserUpdate
-
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from saluki.utils.cache import invalidate_user, revoke_token_claims
+from saluki.utils.passwords import password_hasher
 
 
 class DBUser(Base):
@@ -42,69 +43,86 @@ class DBUser(Base):
     def __repr__(self):
         return f"<DBUser(id={self.id}, email={self.email}, name={self.name}, user_level={self.user_level})>"
 
-    def set_password(self, password):
-        self.password = password_context.hash(password)
-
-    def verify_password(self, password) -> bool:
-        return password_context.verify(password, self.password)
-
 
-def list_users(*, db: Session, skip: int = 0, limit: int = 100) -> list[DBUser]:
-    return db.query(DBUser).offset(skip).limit(limit).all()
+async def list_users(
+    *, db: AsyncSession, skip: int = 0, limit: int = 100, after_id: int | None = None
+) -> list[DBUser]:
+    query = select(DBUser).order_by(DBUser.id).limit(limit)
+    if after_id is not None:
+        # Keyset pagination: seek past the last id seen instead of using an offset
+        query = query.where(DBUser.id > after_id)
+    else:
+        query = query.offset(skip)
+    return list(await db.scalars(query))
 
 
-def list_user(*, db: Session, email: str) -> DBUser | None:
-    return get_user_by_email(db=db, email=email)
+async def list_user(*, db: AsyncSession, email: str) -> DBUser | None:
+    return await get_user_by_email(db=db, email=email)
 
 
-def create_user(*, db: Session, user_dict: UserCreate) -> DBUser:
+async def create_user(*, db: AsyncSession, user_dict: UserCreate) -> DBUser:
     user = DBUser(**user_dict.model_dump())
-    user.set_password(user_dict.password)
+    user.password = await password_hasher.hash(user_dict.password)
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
-def update_user(*, db: Session, user: DBUser, user_dict: UserUpdate) -> DBUser:
+async def update_user(
+    *, db: AsyncSession, user: DBUser, user_dict: UserUpdate
+) -> DBUser:
     user.name = user_dict.name
     user.email = user_dict.email
     if user_dict.password:
-        user.set_password(user_dict.password)
+        user.password = await password_hasher.hash(user_dict.password)
 
     if user_dict.user_level:
+        if user_dict.user_level != user.user_level:
+            revoke_token_claims(user.id)
         user.user_level = user_dict.user_level
 
-    db.commit()
-    db.refresh(user)
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user(user.id)
     return user
 
 
-def remove_user(*, db: Session, user: DBUser) -> bool:
+async def remove_user(*, db: AsyncSession, user: DBUser) -> bool:
     try:
-        db.delete(user)
-        db.commit()
+        user_id = user.id
+        await db.delete(user)
+        await bump_catalogue_version(db=db)
+        await db.commit()
+        invalidate_user(user_id)
+        revoke_token_claims(user_id)
         return True
     except SQLAlchemyError as e:
         return False
 
 
-def get_user_by_email(*, db: Session, email: str) -> DBUser | None:
-    return db.query(DBUser).filter(DBUser.email == email).first()
+async def get_user_by_email(*, db: AsyncSession, email: str) -> DBUser | None:
+    return await db.scalar(select(DBUser).where(DBUser.email == email).limit(1))
 
 
-def authenticate_user(*, db: Session, email: str, password: str) -> DBUser | None:
-    user = get_user_by_email(db=db, email=email)
+async def authenticate_user(
+    *, db: AsyncSession, email: str, password: str
+) -> DBUser | None:
+    user = await get_user_by_email(db=db, email=email)
     if not user:
         return None
-    if not user.verify_password(password):
+    if not await password_hasher.verify(password, user.password):
         return None
     return user
 
 
-def activate_user(*, db: Session, user: DBUser) -> bool:
+async def activate_user(*, db: AsyncSession, user: DBUser) -> bool:
     user.is_active = True
-    db.commit()
-    db.refresh(user)
+    await bump_catalogue_version(db=db)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user(user.id)
     return True
@@ -1,22 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import RedirectResponse
+import datetime
+import logging
+from collections import Counter
+from operator import attrgetter
 
-from saluki.dependencies.database import get_database
-from saluki.dependencies.security import AccessLevelChecker, get_current_user
-from saluki.enums import UserLevel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import RedirectResponse, UJSONResponse
+from sqlalchemy.exc import IntegrityError
+
+from saluki.config import settings
+from saluki.dependencies.caching import CatalogueETag
+from saluki.dependencies.database import get_async_database
+from saluki.dependencies.pagination import get_cursor, set_next_cursor
+from saluki.dependencies.security import (
+    AccessLevelChecker,
+    get_accessible_datafile,
+    get_current_user,
+)
+from saluki.enums import DataFileStatus, DataFileType, UserLevel
 from saluki.models.datafiles import (
+    complete_datafile_upload,
     create_datafile,
+    download_link,
+    is_duplicate_slug,
     list_datafile,
+    list_datafile_rows,
     list_datafiles,
     remove_datafile,
     update_datafile,
+    upsert_datafiles,
 )
 from saluki.schemas.datafiles import (
     DataFile,
+    DataFileBase,
+    DataFileBulkResult,
     DataFileCreate,
+    DataFileFields,
     DataFileInDB,
     DataFileUpdate,
+    DataFileUpload,
 )
+from saluki.utils.files import file_response, local_file_path, open_file_response
+from saluki.utils.storage import StorageError, download_cache, storage, upload_stream
+
+logger = logging.getLogger(__name__)
 
 datafile_router = APIRouter(
     prefix="/datafiles",
@@ -27,44 +53,146 @@ datafile_router = APIRouter(
     },
 )
 
+# Fields returned on listings unless a selection is given. Computed fields such
+# as download_link are only generated when explicitly requested.
+DEFAULT_LISTING_FIELDS = list(DataFileBase.model_fields)
+SELECTABLE_FIELDS = set(DataFileFields.model_fields)
+
+
+def _identity(value):
+    return value
+
+
+ROW_SERIALIZERS = {
+    "type": attrgetter("value"),
+    "status": attrgetter("value"),
+    "start_date": datetime.date.isoformat,
+    "end_date": datetime.date.isoformat,
+}
+
+
+def integrity_error(error: IntegrityError) -> HTTPException:
+    """The error to return when writing data files breaks a database constraint."""
+    if is_duplicate_slug(error):
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Data File already exists"
+        )
+    logger.warning("Couldn't write data files: %s", error.orig)
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Data File violates a database constraint",
+    )
+
+
+def select_fields(fields: str | None, include: str | None) -> list[str]:
+    """Work out which fields to return from the fields and include query parameters."""
+    selected = fields.split(",") if fields else list(DEFAULT_LISTING_FIELDS)
+    if include:
+        selected += [field for field in include.split(",") if field not in selected]
+    unknown = set(selected) - SELECTABLE_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return selected
+
 
-@datafile_router.get("/", response_model=list[DataFile])
-def get_datafiles(
+@datafile_router.get(
+    "/",
+    response_model=list[DataFileFields],
+    response_model_exclude_unset=True,
+    dependencies=[Depends(CatalogueETag())],
+)
+async def get_datafiles(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db=Depends(get_database),
+    fields: str | None = None,
+    include: str | None = None,
+    q: str | None = None,
+    datafile_type: DataFileType | None = Query(None, alias="type"),
+    datafile_status: DataFileStatus | None = Query(None, alias="status"),
+    start_after: datetime.date | None = None,
+    end_before: datetime.date | None = None,
+    after_id: int | None = Depends(get_cursor),
+    db=Depends(get_async_database),
     current_user=Depends(get_current_user),
 ):
-    if current_user.user_level >= UserLevel.editor:
-        return list_datafiles(db=db, skip=skip, limit=limit)
-    elif current_user.user_level == UserLevel.anonymous:
+    selected = select_fields(fields, include)
+    if q and after_id is not None:
+        # Search results are ranked rather than ordered by id, so can't use cursors
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursors can't be used when searching",
+        )
+    if current_user.user_level == UserLevel.anonymous:
         # Need to think about this - three possible options:
         # 1. Bring back the is_public attribute on the DataFile model
         # 2. Add an Anonymous user to the DB, so it can be granted permissions using the normal flow
         # 3. Define in code the types of data files that can be accessed by an Anonymous user and use a different DB query
         return []
-    else:
-        return current_user.datafiles
+    is_editor = current_user.user_level >= UserLevel.editor
+    if not is_editor:
+        # Only editors can see data files that aren't available, e.g. deleted ones
+        if datafile_status not in (None, DataFileStatus.active):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions",
+            )
+        datafile_status = DataFileStatus.active
+    filters = {
+        "skip": skip,
+        "limit": limit,
+        "after_id": after_id,
+        "user_id": None if is_editor else current_user.id,
+        "datafile_type": datafile_type,
+        "datafile_status": datafile_status,
+        "start_after": start_after,
+        "end_before": end_before,
+        "search": q or None,
+    }
+    if settings.fast_json:
+        # Build the response straight from result rows, skipping ORM objects and
+        # response model validation
+        columns = [field for field in selected if field != "download_link"]
+        if "download_link" in selected:
+            columns.append("location")
+        rows = await list_datafile_rows(db=db, columns=columns, **filters)
+        if not q:
+            set_next_cursor(response, rows, limit)
+        return UJSONResponse(
+            [serialize_row(row, selected) for row in rows],
+            headers=dict(response.headers),
+        )
+    datafiles = await list_datafiles(db=db, **filters)
+    if not q:
+        set_next_cursor(response, datafiles, limit)
+    return [
+        {field: getattr(datafile, field) for field in selected}
+        for datafile in datafiles
+    ]
 
 
-@datafile_router.get("/{datafile_id}", response_model=DataFile)
-def get_datafile(
-    datafile_id: str, db=Depends(get_database), current_user=Depends(get_current_user)
-):
-    db_datafile = list_datafile(db=db, slug=datafile_id)
-    if not db_datafile:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Data File not found"
-        )
-    if (
-        current_user.user_level >= UserLevel.editor
-        or db_datafile in current_user.datafiles
-    ):
-        return db_datafile
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions"
-        )
+def serialize_row(row, selected: list[str]) -> dict:
+    """Turn a data file row straight into JSON-ready values."""
+    values = row._mapping
+    serialized = {}
+    for field in selected:
+        if field == "download_link":
+            serialized[field] = download_link(values["location"])
+        else:
+            serialized[field] = ROW_SERIALIZERS.get(field, _identity)(values[field])
+    return serialized
+
+
+@datafile_router.get(
+    "/{datafile_id}",
+    response_model=DataFile,
+    dependencies=[Depends(CatalogueETag(includes_links=True))],
+)
+async def get_datafile(datafile_id: str, db_datafile=Depends(get_accessible_datafile)):
+    return db_datafile
 
 
 @datafile_router.post(
@@ -73,24 +201,61 @@ def get_datafile(
     status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(AccessLevelChecker(UserLevel.editor))],
 )
-def post_datafile(datafile: DataFileCreate, db=Depends(get_database)):
-    db_datafile = create_datafile(db=db, datafile_dict=datafile)
+async def post_datafile(datafile: DataFileCreate, db=Depends(get_async_database)):
+    try:
+        db_datafile = await create_datafile(db=db, datafile_dict=datafile)
+    except IntegrityError as e:
+        raise integrity_error(e)
     return db_datafile
 
 
+@datafile_router.post(
+    "/bulk",
+    response_model=list[DataFileBulkResult],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(AccessLevelChecker(UserLevel.editor))],
+)
+async def post_datafiles_bulk(
+    datafiles: list[DataFileCreate], db=Depends(get_async_database)
+):
+    """Create or update many data files at once, matched on slug."""
+    slugs = [datafile.slug for datafile in datafiles]
+    duplicates = [slug for slug, count in Counter(slugs).items() if count > 1]
+    if duplicates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Duplicate slugs: {', '.join(sorted(duplicates))}",
+        )
+    if not datafiles:
+        return []
+    try:
+        results = await upsert_datafiles(db=db, datafile_dicts=datafiles)
+    except IntegrityError as e:
+        # A slug conflict means another request created one of the data files first
+        raise integrity_error(e)
+    return [
+        DataFileBulkResult(slug=slug, id=results[slug][0], created=results[slug][1])
+        for slug in slugs
+    ]
+
+
 @datafile_router.put(
     "/{datafile_id}",
     response_model=DataFile,
     status_code=status.HTTP_200_OK,
     dependencies=[Depends(AccessLevelChecker(UserLevel.editor))],
 )
-def put_datafile(datafile_id: str, datafile: DataFileUpdate, db=Depends(get_database)):
-    db_datafile = get_datafile(db=db, slug=datafile_id)
+async def put_datafile(
+    datafile_id: str, datafile: DataFileUpdate, db=Depends(get_async_database)
+):
+    db_datafile = await list_datafile(db=db, slug=datafile_id)
     if not db_datafile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Data File not found"
         )
-    db_datafile = update_datafile(db=db, datafile=db_datafile, datafile_dict=datafile)
+    db_datafile = await update_datafile(
+        db=db, datafile=db_datafile, datafile_dict=datafile
+    )
     return db_datafile
 
 
@@ -99,30 +264,97 @@ def put_datafile(datafile_id: str, datafile: DataFileUpdate, db=Depends(get_data
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(AccessLevelChecker(UserLevel.editor))],
 )
-def delete_datafile(datafile_id: str, db=Depends(get_database)):
-    db_datafile = get_datafile(db=db, slug=datafile_id)
+async def delete_datafile(datafile_id: str, db=Depends(get_async_database)):
+    db_datafile = await list_datafile(db=db, slug=datafile_id)
     if not db_datafile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Data File not found"
         )
-    return remove_datafile(db=db, datafile=db_datafile)
+    return await remove_datafile(db=db, datafile=db_datafile)
 
 
-@datafile_router.get("/{datafile_id}/download", response_class=RedirectResponse)
-def download_datafile(
-    datafile_id: str, db=Depends(get_database), current_user=Depends(get_current_user)
+@datafile_router.api_route(
+    "/{datafile_id}/download",
+    methods=["GET", "HEAD"],
+    response_class=RedirectResponse,
+)
+async def download_datafile(
+    request: Request, datafile_id: str, db_datafile=Depends(get_accessible_datafile)
 ):
-    db_datafile = list_datafile(db=db, slug=datafile_id)
+    # Files on local disk are streamed directly rather than redirected to
+    path = local_file_path(db_datafile.location)
+    if path:
+        return file_response(path, request)
+    if download_cache and db_datafile.storage_key:
+        file = download_cache.open(db_datafile.storage_key)
+        if file:
+            return open_file_response(file, request, db_datafile.storage_key)
+        # Rather than keep the client waiting while the whole object is fetched,
+        # send it to S3 this time and cache the object for later requests
+        if request.method == "GET":
+            download_cache.prefetch(db_datafile.storage_key)
+    return db_datafile.download_link
+
+
+@datafile_router.put(
+    "/{datafile_id}/upload",
+    response_model=DataFileUpload,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(AccessLevelChecker(UserLevel.editor))],
+)
+async def upload_datafile(
+    request: Request,
+    datafile_id: str,
+    filename: str | None = None,
+    record_count: int | None = None,
+    db=Depends(get_async_database),
+):
+    """Upload the contents of a data file, streaming the request body to storage."""
+    db_datafile = await list_datafile(db=db, slug=datafile_id)
     if not db_datafile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Data File not found"
         )
-    if (
-        current_user.user_level >= UserLevel.editor
-        or db_datafile in current_user.datafiles
-    ):
-        return db_datafile.download_link
-    else:
+    key = filename or db_datafile.slug
+    if "/" in key or key.startswith("."):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions"
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename"
+        )
+    slug = db_datafile.slug
+    # End the lookup's transaction, so no database connection is held for what
+    # may be a very long upload
+    await db.rollback()
+    try:
+        result = await upload_stream(
+            storage,
+            key,
+            request.stream(),
+            part_size=settings.upload_part_size,
+            concurrency=settings.upload_concurrency,
+        )
+    except StorageError as e:
+        logger.error("Couldn't upload %s: %s", key, e)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY, detail="Upload to storage failed"
+        )
+    if download_cache:
+        download_cache.discard(key)
+    db_datafile = await list_datafile(db=db, slug=slug)
+    if not db_datafile:
+        # Removed while the upload was in progress
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Data File not found"
         )
+    db_datafile = await complete_datafile_upload(
+        db=db,
+        datafile=db_datafile,
+        location=storage.location(key),
+        record_count=record_count,
+    )
+    return DataFileUpload(
+        slug=db_datafile.slug,
+        status=db_datafile.status,
+        location=db_datafile.location,
+        size=result.size,
+        sha256=result.sha256,
+    )
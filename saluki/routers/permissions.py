@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from saluki.dependencies.database import get_database
+from saluki.dependencies.database import get_async_database
 from saluki.dependencies.security import AccessLevelChecker
 from saluki.enums import PermissionType, UserLevel
 from saluki.models.datafiles import list_datafile
 from saluki.models.permissions import (
     create_permission,
+    create_permissions,
     get_permission_by_id_and_type,
+    list_datafile_permissions,
+    list_user_permissions,
     remove_permission,
+    remove_permissions,
 )
 from saluki.models.users import list_user
 from saluki.schemas.permissions import DataFilePermission, DataFileTypePermission
+from saluki.utils.permissions import permission_index
 
 permissions_router = APIRouter(
     prefix="/permissions",
@@ -27,13 +32,17 @@ permissions_router = APIRouter(
     response_model=list[DataFilePermission | DataFileTypePermission],
     dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
 )
-def get_permissions_for_datafile(data_file_id: str, db=Depends(get_database)):
-    datafile = list_datafile(db=db, slug=data_file_id)
+async def get_permissions_for_datafile(
+    data_file_id: str, db=Depends(get_async_database)
+):
+    datafile = await list_datafile(db=db, slug=data_file_id)
     if not datafile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Data file not found"
         )
-    return datafile.permissions
+    return await list_datafile_permissions(
+        db=db, data_file_id=datafile.id, data_file_type=datafile.type
+    )
 
 
 @permissions_router.get(
@@ -41,13 +50,13 @@ def get_permissions_for_datafile(data_file_id: str, db=Depends(get_database)):
     response_model=list[DataFilePermission | DataFileTypePermission],
     dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
 )
-def get_permissions_for_user(user_id: str, db=Depends(get_database)):
-    user = list_user(db=db, email=user_id)
+async def get_permissions_for_user(user_id: str, db=Depends(get_async_database)):
+    user = await list_user(db=db, email=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    return user.permissions
+    return await list_user_permissions(db=db, user_id=user.id)
 
 
 @permissions_router.post(
@@ -56,11 +65,49 @@ def get_permissions_for_user(user_id: str, db=Depends(get_database)):
     status_code=status.HTTP_201_CREATED,
     dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
 )
-def post_permission(
+async def post_permission(
     permission: DataFilePermission | DataFileTypePermission,
-    db=Depends(get_database),
+    db=Depends(get_async_database),
+):
+    db_permission = await create_permission(db=db, permission_dict=permission)
+    permission_index.grant(db_permission)
+    return db_permission
+
+
+@permissions_router.post(
+    "/bulk",
+    response_model=list[DataFilePermission | DataFileTypePermission],
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
+)
+async def post_permissions_bulk(
+    permissions: list[DataFilePermission | DataFileTypePermission],
+    db=Depends(get_async_database),
+):
+    """Grant many permissions at once, returning those that weren't already granted."""
+    if not permissions:
+        return []
+    created = await create_permissions(db=db, permission_dicts=permissions)
+    for permission in created:
+        permission_index.grant(permission)
+    return created
+
+
+@permissions_router.delete(
+    "/bulk",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
+)
+async def delete_permissions_bulk(
+    permissions: list[DataFilePermission | DataFileTypePermission],
+    db=Depends(get_async_database),
 ):
-    return create_permission(db=db, permission_dict=permission)
+    """Revoke many permissions at once; permissions that don't exist are ignored."""
+    if not permissions:
+        return
+    await remove_permissions(db=db, permission_dicts=permissions)
+    for permission in permissions:
+        permission_index.revoke(permission)
 
 
 @permissions_router.delete(
@@ -68,14 +115,17 @@ def post_permission(
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
 )
-def delete_permission(
-    permission_type: PermissionType, permission_id: int, db=Depends(get_database)
+async def delete_permission(
+    permission_type: PermissionType, permission_id: int, db=Depends(get_async_database)
 ):
-    permission = get_permission_by_id_and_type(
+    permission = await get_permission_by_id_and_type(
         db=db, permission_id=permission_id, permission_type=permission_type
     )
     if not permission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Permission not found"
         )
-    return remove_permission(db=db, permission=permission)
+    removed = await remove_permission(db=db, permission=permission)
+    if removed:
+        permission_index.revoke(permission)
+    return removed
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 
-from saluki.dependencies.database import get_database
+from saluki.dependencies.caching import CatalogueETag
+from saluki.dependencies.database import get_async_database
+from saluki.dependencies.pagination import get_cursor, set_next_cursor
 from saluki.dependencies.security import (
     AccessLevelChecker,
     create_verification_token,
@@ -19,6 +21,7 @@ from saluki.models.users import (
 )
 from saluki.schemas.users import User, UserCreate, UserInDB, UserUpdate
 from saluki.utils.email import send_confirmation_email
+from saluki.utils.permissions import permission_index
 
 user_router = APIRouter(
     prefix="/users",
@@ -33,21 +36,32 @@ user_router = APIRouter(
 @user_router.get(
     "/",
     response_model=list[User],
-    dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
+    dependencies=[
+        Depends(AccessLevelChecker(UserLevel.staff)),
+        Depends(CatalogueETag()),
+    ],
 )
-def get_users(skip: int = 0, limit: int = 100, db=Depends(get_database)):
-    return list_users(db=db, skip=skip, limit=limit)
+async def get_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: int | None = Depends(get_cursor),
+    db=Depends(get_async_database),
+):
+    users = await list_users(db=db, skip=skip, limit=limit, after_id=after_id)
+    set_next_cursor(response, users, limit)
+    return users
 
 
 @user_router.get("/confirm")
-def confirm_user(token: str, db=Depends(get_database)):
+async def confirm_user(token: str, db=Depends(get_async_database)):
     token_user = get_token_user(token=token, action="confirm")
-    db_user = list_user(db=db, email=token_user)
+    db_user = await list_user(db=db, email=token_user)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    success = activate_user(db=db, user=db_user)
+    success = await activate_user(db=db, user=db_user)
     if success:
         return {"message": "User activated successfully"}
     else:
@@ -61,15 +75,15 @@ def confirm_user(token: str, db=Depends(get_database)):
     response_model=User,
     dependencies=[Depends(AccessLevelChecker(UserLevel.user))],
 )
-def get_user(
-    user_id: str, db=Depends(get_database), current_user=Depends(get_current_user)
+async def get_user(
+    user_id: str, db=Depends(get_async_database), current_user=Depends(get_current_user)
 ):
-    db_user = list_user(db=db, email=user_id)
+    db_user = await list_user(db=db, email=user_id)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    if current_user == db_user or current_user.user_level >= UserLevel.staff:
+    if current_user.id == db_user.id or current_user.user_level >= UserLevel.staff:
         return db_user
     else:
         raise HTTPException(
@@ -78,8 +92,8 @@ def get_user(
 
 
 @user_router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
-def post_user(request: Request, user: UserCreate, db=Depends(get_database)):
-    db_user = create_user(db=db, user_dict=user)
+async def post_user(request: Request, user: UserCreate, db=Depends(get_async_database)):
+    db_user = await create_user(db=db, user_dict=user)
     confirmation_token = create_verification_token(db_user)
     confirmation_url = request.url_for("confirm_user").include_query_params(
         token=confirmation_token
@@ -95,22 +109,22 @@ def post_user(request: Request, user: UserCreate, db=Depends(get_database)):
     status_code=status.HTTP_200_OK,
     dependencies=[Depends(AccessLevelChecker(UserLevel.user))],
 )
-def put_user(
+async def put_user(
     user_id: str,
     user: UserUpdate,
-    db=Depends(get_database),
+    db=Depends(get_async_database),
     current_user=Depends(get_current_user),
 ):
-    db_user = get_user_by_email(db=db, email=user_id)
+    db_user = await get_user_by_email(db=db, email=user_id)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    if current_user == db_user or current_user.user_level >= UserLevel.staff:
+    if current_user.id == db_user.id or current_user.user_level >= UserLevel.staff:
         # Don't let a level be increased higher than the level below the current user
         if user.user_level and user.user_level >= current_user.user_level:
             user.user_level = None
-        db_user = update_user(db=db, user=db_user, user_dict=user)
+        db_user = await update_user(db=db, user=db_user, user_dict=user)
         return db_user
     else:
         raise HTTPException(
@@ -123,10 +137,14 @@ def put_user(
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(AccessLevelChecker(UserLevel.staff))],
 )
-def delete_user(user_id: str, db=Depends(get_database)):
-    db_user = get_user_by_email(db=db, email=user_id)
+async def delete_user(user_id: str, db=Depends(get_async_database)):
+    db_user = await get_user_by_email(db=db, email=user_id)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    return remove_user(db=db, user=db_user)
+    user_id = db_user.id
+    removed = await remove_user(db=db, user=db_user)
+    if removed:
+        permission_index.forget_user(user_id)
+    return removed
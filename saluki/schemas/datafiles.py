@@ -37,3 +37,33 @@ class DataFileInDB(DataFileBase):
 # Additional properties to return via API
 class DataFile(DataFileBase):
     download_link: Optional[AnyUrl] = None
+
+
+# Properties that can be selected on listings; all optional so that only the
+# requested fields are returned
+class DataFileFields(BaseModel):
+    slug: Optional[str] = None
+    description: Optional[str] = None
+    type: Optional[DataFileType] = None
+    record_count: Optional[int] = None
+    start_date: Optional[datetime.date] = None
+    end_date: Optional[datetime.date] = None
+    status: Optional[DataFileStatus] = None
+    doi: Optional[str] = None
+    download_link: Optional[AnyUrl] = None
+
+
+# Properties returned once a data file's contents have been uploaded
+class DataFileUpload(BaseModel):
+    slug: str
+    status: DataFileStatus
+    location: str
+    size: int
+    sha256: str
+
+
+# Outcome of one item of a bulk create or update
+class DataFileBulkResult(BaseModel):
+    slug: str
+    id: int
+    created: bool
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 
 from saluki.enums import UserLevel
 
@@ -35,3 +35,14 @@ class User(UserBase):
     id: int
     user_level: UserLevel
     is_active: bool
+
+
+# Lightweight snapshot of the authenticated user, cached per access token
+class CurrentUser(BaseModel):
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: Optional[int] = None
+    email: Optional[str] = None
+    name: Optional[str] = None
+    user_level: UserLevel
+    is_active: bool
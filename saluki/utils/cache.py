@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from saluki.config import settings
+
+
+class TTLCache:
+    """A bounded, thread-safe LRU mapping whose entries expire after a time to live."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Any, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_where(self, predicate: Callable[[Any], bool]):
+        """Remove every entry whose value matches the predicate."""
+        with self._lock:
+            for key in [k for k, (v, _) in self._entries.items() if predicate(v)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Validated access tokens mapped to snapshots of the users they belong to
+token_cache = TTLCache(
+    maxsize=settings.token_cache_size, ttl=settings.token_cache_seconds
+)
+
+
+def invalidate_user(user_id: int):
+    """Forget any cached tokens for a user whose details have changed.
+
+    The cache is per process, so other workers keep using their cached copy of
+    the user for up to token_cache_seconds.
+    """
+    token_cache.discard_where(lambda user: user.id == user_id)
+
+
+# When each user last had the claims in their tokens revoked, e.g. on demotion
+claims_revoked_at: dict[int, float] = {}
+
+
+def revoke_token_claims(user_id: int):
+    """Stop trusting the level claims of tokens already issued to a user."""
+    claims_revoked_at[user_id] = time.time()
+
+
+def token_claims_revoked(user_id: int, issued_at: float) -> bool:
+    return issued_at <= claims_revoked_at.get(user_id, 0)
@@ -1,6 +1,20 @@
+import asyncio
+import logging
+import time
+from urllib.parse import parse_qsl
+
 import httpx
 
 from saluki.config import settings
+from saluki.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+mailgun_duration = registry.histogram(
+    "saluki_mailgun_request_duration_seconds",
+    "Time taken by requests to Mailgun, by response status.",
+    labels=("status",),
+)
 
 CONFIRMATION_EMAIL_TEMPLATE = """
 Dear {name},
@@ -22,19 +36,172 @@ Email: support@datacite.org
 """
 
 
+class EmailOutbox:
+    """Delivers emails in the background so requests never wait on Mailgun.
+
+    Messages are queued in process and sent by a worker task that drains the
+    queue in batches, through one shared keep-alive HTTP client. Sends are
+    bounded by a concurrency limit and retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int,
+        batch_size: int,
+        max_retries: int,
+        retry_backoff: float,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.transport = transport
+        self._loop = None
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def send(self, message: dict):
+        """Queue a message for delivery; must be called from the event loop."""
+        if self._loop is not asyncio.get_running_loop():
+            self._start()
+        elif self._worker.done():
+            self._restart_worker()
+        self._queue.put_nowait(message)
+
+    async def flush(self):
+        """Wait until every queued message has been delivered or given up on."""
+        if self._queue is None:
+            return
+        if self._worker.done():
+            # Nothing would ever drain the queue otherwise
+            self._restart_worker()
+        await self._queue.join()
+
+    async def close(self):
+        if self._worker is None:
+            return
+        await self.flush()
+        self._worker.cancel()
+        await self._client.aclose()
+        self._loop = self._queue = self._worker = self._client = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=settings.mailgun_endpoint,
+            auth=("api", settings.mailgun_api_key),
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            transport=self.transport,
+        )
+        self._worker = asyncio.create_task(self._run())
+
+    def _restart_worker(self):
+        if not self._worker.cancelled() and self._worker.exception() is not None:
+            logger.error(
+                "Email worker stopped unexpectedly", exc_info=self._worker.exception()
+            )
+        self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.gather(
+                    *(self._deliver(message) for message in batch),
+                    return_exceptions=True,
+                )
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, message: dict) -> dict | None:
+        try:
+            return await self._send_with_retries(message)
+        except Exception:
+            # Anything unexpected gives up on this message but keeps the worker alive
+            logger.exception("Couldn't send email to %s", message.get("to"))
+            return None
+
+    async def _send_with_retries(self, message: dict) -> dict | None:
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._post(message)
+                    response.raise_for_status()
+                    return response.json()
+                except httpx.HTTPStatusError as e:
+                    # Client errors other than rate limiting won't succeed on retry
+                    if e.response.status_code < 500 and e.response.status_code != 429:
+                        logger.error(
+                            "Mailgun rejected email to %s: %s", message["to"], e
+                        )
+                        return None
+                    error = e
+                except httpx.HTTPError as e:
+                    error = e
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_backoff * 2**attempt)
+            logger.error("Couldn't send email to %s: %s", message["to"], error)
+            return None
+
+    async def _post(self, message: dict) -> httpx.Response:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._client.post("/messages", data=message)
+            outcome = response.status_code
+            return response
+        finally:
+            mailgun_duration.observe(time.perf_counter() - start, outcome)
+
+
+class StubMailTransport(httpx.AsyncBaseTransport):
+    """Stands in for Mailgun when running offline, recording what would be sent."""
+
+    def __init__(self):
+        self.sent: list[dict] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.sent.append(dict(parse_qsl((await request.aread()).decode())))
+        return httpx.Response(
+            200, json={"id": f"<stub-{len(self.sent)}>", "message": "Queued"}
+        )
+
+
+outbox = EmailOutbox(
+    concurrency=settings.email_concurrency,
+    batch_size=settings.email_batch_size,
+    max_retries=settings.email_max_retries,
+    retry_backoff=settings.email_retry_backoff_seconds,
+    transport=StubMailTransport() if settings.email_backend == "stub" else None,
+)
+
+
 def send_email(to: str, subject: str, body: str) -> dict:
-    response = httpx.post(
-        f"{settings.mailgun_endpoint}/messages",
-        auth=("api", settings.mailgun_api_key),
-        data={
+    outbox.send(
+        {
             "from": f"{settings.email_from} <{settings.email_address}>",
             "to": to,
             "subject": subject,
             "text": body,
-        },
+        }
     )
-    response.raise_for_status()
-    return response.json()
+    return {"message": "Queued"}
 
 
 def send_confirmation_email(user, confirmation_url: str) -> dict:
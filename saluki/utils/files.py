@@ -0,0 +1,181 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import unquote, urlparse
+
+import anyio
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from saluki.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"')
+BYTE_RANGE = re.compile(r"(\d*)-(\d*)", re.ASCII)
+
+
+def local_roots() -> list[Path]:
+    """Directories whose files may be served directly."""
+    roots = []
+    if settings.local_data_root:
+        roots.append(Path(settings.local_data_root).resolve())
+    if settings.storage_backend == "local":
+        # Uploads are stored here when there's no S3 to redirect to
+        roots.append(Path(settings.local_storage_root).resolve())
+    return roots
+
+
+def local_file_path(location: str | None) -> Path | None:
+    """Resolve a file:// or plain path location to a file under a local root.
+
+    Returns None if the location isn't local, or local files aren't being served.
+    """
+    roots = local_roots()
+    if not location or not roots:
+        return None
+    if location.startswith("file://"):
+        path = unquote(urlparse(location).path)
+    elif location.startswith("/"):
+        path = location
+    else:
+        return None
+    resolved = Path(path).resolve()
+    # Never serve anything outside the roots, e.g. via ../ segments
+    if not any(resolved.is_relative_to(root) for root in roots):
+        return None
+    return resolved
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches the current entity tag.
+
+    Uses the weak comparison RFC 9110 requires for If-None-Match, so a W/
+    prefix on either tag is ignored.
+    """
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in ENTITY_TAG.findall(header))
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single byte range from a Range header into inclusive start and end.
+
+    Returns None if the header should be ignored, including when it isn't a
+    valid range, and raises a 416 if the range can't be satisfied.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        # Multiple ranges aren't supported, so serve the whole file instead
+        return None
+    match = BYTE_RANGE.fullmatch(ranges.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if start:
+        first = int(start)
+        if end and int(end) < first:
+            # Invalid rather than unsatisfiable, so RFC 9110 says to ignore it
+            return None
+        last = min(int(end), size - 1) if end else size - 1
+    else:
+        # A suffix range: the last n bytes
+        first = max(size - int(end), 0) if int(end) else size
+        last = size - 1
+    if first >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return first, last
+
+
+async def read_chunks(file: BinaryIO, start: int, length: int):
+    """Read part of an open file, closing it once done."""
+    try:
+        async_file = anyio.wrap_file(file)
+        await async_file.seek(start)
+        while length > 0:
+            chunk = await async_file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_response(path: Path, request: Request) -> Response:
+    """Stream a local file, honouring conditional and Range requests."""
+    try:
+        file = open(path, "rb")
+    except (FileNotFoundError, IsADirectoryError):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Data File not available"
+        )
+    return open_file_response(file, request, path.name)
+
+
+def open_file_response(file: BinaryIO, request: Request, filename: str) -> Response:
+    """Stream a file that's already open, closing it once the response is sent.
+
+    Reading from the open file means it can still be sent if it's deleted
+    before the response finishes, e.g. by a cache evicting it.
+    """
+    try:
+        response = _file_response(file, request, filename)
+    except BaseException:
+        file.close()
+        raise
+    if not isinstance(response, StreamingResponse):
+        file.close()
+    return response
+
+
+def _file_response(file: BinaryIO, request: Request, filename: str) -> Response:
+    stat = os.fstat(file.fileno())
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A Range is only honoured on GETs, and if the client's copy is still current
+    if (
+        range_header
+        and request.method == "GET"
+        and (if_range is None or if_range in (etag, last_modified))
+    ):
+        byte_range = parse_range(range_header, size)
+
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        if request.method == "HEAD":
+            return Response(media_type=media_type, headers=headers)
+        return StreamingResponse(
+            read_chunks(file, 0, size), media_type=media_type, headers=headers
+        )
+    first, last = byte_range
+    headers["Content-Length"] = str(last - first + 1)
+    headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    return StreamingResponse(
+        read_chunks(file, first, last - first + 1),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -0,0 +1,203 @@
+import time
+from bisect import bisect_left
+from typing import Callable
+
+# Upper bounds in seconds, from sub-millisecond lookups to slow external calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        # Updates rely on the GIL rather than a lock; a rare lost increment
+        # under thread contention is an acceptable price for the speed
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in list(self._values.items()):
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Histogram:
+    """Counts observations, such as latencies, into cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Per label set, a count for each bucket plus one for +Inf, then the sum
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values.setdefault(labels, [0] * (len(self.buckets) + 2))
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        for labels, counts in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(self.labels, labels, f'le="{bound}"'),
+                    cumulative,
+                )
+            formatted = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum", formatted, counts[-1]
+            yield f"{self.name}_count", formatted, cumulative
+
+
+class Gauge:
+    """A value read when metrics are collected.
+
+    The callback returns either a number, or a dict of label values to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], float | dict],
+        labels: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = labels
+
+    def samples(self):
+        value = self.callback()
+        if value is None:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, sample in value.items():
+            yield self.name, _format_labels(self.labels, labels), sample
+
+
+class Registry:
+    """Collects the app's metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(
+        self, name: str, documentation: str, labels=(), **kwargs
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, **kwargs))
+
+    def gauge(self, name: str, documentation: str, callback, labels=()) -> Gauge:
+        return self._register(Gauge(name, documentation, callback, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+registry = Registry()
+
+request_count = registry.counter(
+    "saluki_http_requests_total",
+    "HTTP requests handled, by route and response status.",
+    labels=("method", "route", "status"),
+)
+request_duration = registry.histogram(
+    "saluki_http_request_duration_seconds",
+    "Time taken to handle HTTP requests, by route.",
+    labels=("method", "route"),
+)
+
+
+class MetricsMiddleware:
+    """Records the count and latency of requests to each route.
+
+    Requests are labelled with the route's path template rather than the
+    requested path, so that path parameters don't each get their own series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            request_duration.observe(time.perf_counter() - start, scope["method"], path)
+            request_count.inc(scope["method"], path, status_code)
@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+from saluki.config import settings
+
+password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return password_context.hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return password_context.verify(password, hashed_password)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password operations are already waiting."""
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool.
+
+    Each hash takes hundreds of milliseconds of CPU, so running it in the web
+    worker would hold the GIL and stall every other request. Work beyond the
+    pool size waits in a bounded queue, and is rejected once that is full.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.in_flight - self.workers, 0)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def _submit(self, function, *args):
+        if self.queue_depth >= self.queue_limit:
+            raise PasswordHasherBusy()
+        self.in_flight += 1
+        try:
+            try:
+                return await self._run(function, *args)
+            except BrokenProcessPool:
+                # A worker died, e.g. killed for using too much memory, which
+                # breaks the whole pool; start a fresh one and try once more
+                return await self._run(function, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def _run(self, function, *args):
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, function, *args
+            )
+        except BrokenProcessPool:
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork, as forking a process with threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    queue_limit=settings.password_hash_queue_limit,
+)
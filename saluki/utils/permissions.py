@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from saluki.dependencies.database import AsyncDBSession
+from saluki.enums import DataFileType
+from saluki.models import DBDataFile, DBDataFilePermission, DBDataFileTypePermission
+from saluki.schemas.permissions import DataFilePermission, DataFileTypePermission
+
+logger = logging.getLogger(__name__)
+
+# Permission rows read at a time while rebuilding, between which other
+# requests get a turn on the event loop
+REBUILD_BATCH_SIZE = 10_000
+
+
+class PermissionIndex:
+    """In-process index of the data files and data file types granted to each user.
+
+    Permissions are read on every data file request but change rarely, so access
+    checks are answered from memory. The index is kept up to date by the routes
+    that grant and revoke permissions, and rebuilt periodically to pick up
+    changes made by other workers.
+    """
+
+    def __init__(self):
+        self._datafiles: dict[int, set[int]] = {}
+        self._types: dict[int, set[DataFileType]] = {}
+        self._lock = threading.Lock()
+        # Changes made while a rebuild is in progress, replayed once it finishes
+        self._pending: list[tuple] | None = None
+        self.built_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    async def rebuild(self, db: AsyncSession):
+        """Replace the index with the permissions currently in the database.
+
+        Rows are streamed in batches, so the event loop can serve requests
+        between them while the new index is built, and the new index is
+        swapped in all at once.
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            datafiles = await self._load(
+                db,
+                select(DBDataFilePermission.user_id, DBDataFilePermission.data_file_id),
+            )
+            types = await self._load(
+                db,
+                select(
+                    DBDataFileTypePermission.user_id,
+                    DBDataFileTypePermission.data_file_type,
+                ),
+            )
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            self._datafiles = datafiles
+            self._types = types
+            for change in self._pending:
+                self._apply(*change)
+            self._pending = None
+            self.built_at = time.monotonic()
+
+    @staticmethod
+    async def _load(db: AsyncSession, query) -> dict[int, set]:
+        index = defaultdict(set)
+        result = await db.stream(query.execution_options(yield_per=REBUILD_BATCH_SIZE))
+        async for rows in result.partitions():
+            for user_id, key in rows:
+                index[user_id].add(key)
+        # Lookups mustn't add empty entries for users without permissions
+        index.default_factory = None
+        return index
+
+    def grant(
+        self,
+        permission: DBDataFilePermission
+        | DBDataFileTypePermission
+        | DataFilePermission
+        | DataFileTypePermission,
+    ):
+        self._change(True, permission)
+
+    def revoke(
+        self,
+        permission: DBDataFilePermission
+        | DBDataFileTypePermission
+        | DataFilePermission
+        | DataFileTypePermission,
+    ):
+        self._change(False, permission)
+
+    def forget_user(self, user_id: int):
+        """Drop every permission held by a user, e.g. when they are deleted."""
+        with self._lock:
+            self._datafiles.pop(user_id, None)
+            self._types.pop(user_id, None)
+            if self._pending is not None:
+                self._pending.append((None, user_id, None, None))
+
+    def can_access(self, user_id: int, datafile: DBDataFile) -> bool:
+        return datafile.id in self._datafiles.get(
+            user_id, ()
+        ) or datafile.type in self._types.get(user_id, ())
+
+    def _change(self, granted: bool, permission):
+        if isinstance(permission, (DBDataFileTypePermission, DataFileTypePermission)):
+            change = (granted, permission.user_id, None, permission.data_file_type)
+        else:
+            change = (granted, permission.user_id, permission.data_file_id, None)
+        with self._lock:
+            self._apply(*change)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def _apply(self, granted, user_id, data_file_id, data_file_type):
+        if granted is None:
+            self._datafiles.pop(user_id, None)
+            self._types.pop(user_id, None)
+            return
+        if data_file_type is not None:
+            index, key = self._types, data_file_type
+        else:
+            index, key = self._datafiles, data_file_id
+        if granted:
+            index.setdefault(user_id, set()).add(key)
+        elif user_id in index:
+            index[user_id].discard(key)
+
+
+permission_index = PermissionIndex()
+
+
+async def rebuild_permission_index():
+    async with AsyncDBSession() as db:
+        await permission_index.rebuild(db)
+
+
+async def refresh_permission_index(interval: int):
+    """Rebuild the permission index every interval seconds."""
+    while True:
+        try:
+            await rebuild_permission_index()
+        except Exception:
+            # Keep refreshing whatever went wrong, or the index would go stale
+            logger.exception("Couldn't rebuild the permission index")
+        await asyncio.sleep(interval)
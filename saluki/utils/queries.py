@@ -0,0 +1,107 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from saluki.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when a request runs too many or repeated queries."""
+
+
+class QueryStats:
+    """The SQL statements run while handling a request, and the time they took."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def problems(self, budget: int, repeat_limit: int) -> list[str]:
+        problems = []
+        if self.count > budget:
+            problems.append(f"ran {self.count} queries, over the budget of {budget}")
+        for statement, count in self.statements.items():
+            if count >= repeat_limit:
+                # Usually a lazy-loaded relationship being read in a loop
+                summary = " ".join(statement.split())[:200]
+                problems.append(f"ran the same statement {count} times: {summary}")
+        return problems
+
+
+request_queries: ContextVar[QueryStats | None] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_queries.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_queries.get()
+    if stats is None or not conn.info.get("query_started_at"):
+        return
+    stats.duration += time.perf_counter() - conn.info["query_started_at"].pop()
+    stats.count += 1
+    # Statements are parameterised, so the same text means the same query shape
+    stats.statements[statement] += 1
+
+
+# Listening on the Engine class covers the async engine's sync core, and the
+# sync engine whenever it's created
+event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+class QueryCounterMiddleware:
+    """Counts the SQL queries run by each request, and flags likely N+1 queries.
+
+    The count and total query time are returned in a Server-Timing header.
+    Requests that go over the query budget, or repeat the same statement too
+    often, are logged, or fail if query_budget_strict is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = request_queries.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                self.check(scope, stats)
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.2f}',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_queries.reset(token)
+
+    def check(self, scope, stats: QueryStats):
+        problems = stats.problems(settings.query_budget, settings.query_repeat_limit)
+        if not problems:
+            return
+        route = scope.get("route")
+        path = route.path if route is not None else scope["path"]
+        for problem in problems:
+            logger.warning("%s %s %s", scope["method"], path, problem)
+        if settings.query_budget_strict:
+            raise QueryBudgetExceeded(f"{scope['method']} {path} {problems[0]}")
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from saluki.config import settings
+from saluki.utils.cache import TTLCache
+from saluki.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+presign_duration = registry.histogram(
+    "saluki_s3_presign_duration_seconds",
+    "Time taken to generate presigned S3 URLs, excluding cached URLs.",
+)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """The boto3 S3 client shared by the whole process.
+
+    Creating a client is expensive, so only do it once per process.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client("s3")
+    return _client
+
+
+class S3Presigner:
+    """Generates presigned S3 download URLs.
+
+    The boto3 client is shared with the rest of the process, and presigned URLs
+    are cached per object key until shortly before they expire. The least
+    recently used URLs are dropped once the cache holds cache_size of them.
+    """
+
+    def __init__(
+        self, bucket: str, expires_in: int, refresh_margin: int, cache_size: int
+    ):
+        self.bucket = bucket
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        self._client = None
+        self._urls = TTLCache(maxsize=cache_size, ttl=expires_in - refresh_margin)
+
+    @property
+    def client(self):
+        return self._client or get_s3_client()
+
+    def presign(self, key: str) -> str | None:
+        """Return a presigned URL for the object key, reusing a cached one if still valid."""
+        cached = self._urls.get(key)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        try:
+            url = self.client.generate_presigned_url(
+                ClientMethod="get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=self.expires_in,
+            )
+        except ClientError as e:
+            logger.warning("Couldn't generate presigned URL for %s: %s", key, e)
+            return None
+        finally:
+            presign_duration.observe(time.perf_counter() - start)
+
+        self._urls.set(key, url)
+        return url
+
+    def clear(self):
+        self._urls.clear()
+
+
+presigner = S3Presigner(
+    bucket=settings.s3_bucket,
+    expires_in=settings.s3_presign_expire_seconds,
+    refresh_margin=settings.s3_presign_refresh_seconds,
+    cache_size=settings.s3_presign_cache_size,
+)
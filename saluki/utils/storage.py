@@ -0,0 +1,358 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+from urllib.parse import quote
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from saluki.config import settings
+from saluki.utils.s3 import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    """Raised when the storage backend can't be reached or fails."""
+
+
+class S3Storage:
+    """Reads data file objects from the S3 bucket."""
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    @property
+    def client(self):
+        return get_s3_client()
+
+    def location(self, key: str) -> str:
+        """The data file location of an object."""
+        return f"s3://{self.bucket}/{key}"
+
+    def download(self, key: str, destination: Path):
+        try:
+            self.client.download_file(self.bucket, key, str(destination))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(key) from e
+            raise StorageError(e) from e
+        except BotoCoreError as e:
+            raise StorageError(e) from e
+
+    def start_upload(self, key: str) -> str:
+        response = self._call("create_multipart_upload", Bucket=self.bucket, Key=key)
+        return response["UploadId"]
+
+    def upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> dict:
+        response = self._call(
+            "upload_part",
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=data,
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    def complete_upload(self, key: str, upload_id: str, parts: list[dict]):
+        self._call(
+            "complete_multipart_upload",
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    def abort_upload(self, key: str, upload_id: str):
+        self._call(
+            "abort_multipart_upload", Bucket=self.bucket, Key=key, UploadId=upload_id
+        )
+
+    def _call(self, method: str, **kwargs) -> dict:
+        try:
+            return getattr(self.client, method)(**kwargs)
+        except (BotoCoreError, ClientError) as e:
+            raise StorageError(e) from e
+
+
+@contextmanager
+def _local_errors():
+    """Raise filesystem errors as StorageError, as S3 errors are."""
+    try:
+        yield
+    except OSError as e:
+        raise StorageError(e) from e
+
+
+class LocalStorage:
+    """Stands in for S3 by reading objects from a local directory, for offline use."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def location(self, key: str) -> str:
+        """The data file location of an object."""
+        return (self.root / key).resolve().as_uri()
+
+    def download(self, key: str, destination: Path):
+        try:
+            shutil.copyfile(self.root / key, destination)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(key) from e
+        except OSError as e:
+            raise StorageError(e) from e
+
+    def start_upload(self, key: str) -> str:
+        upload_id = uuid.uuid4().hex
+        with _local_errors():
+            self._parts_directory(upload_id).mkdir(parents=True)
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> dict:
+        with _local_errors():
+            (self._parts_directory(upload_id) / f"{number:05d}").write_bytes(data)
+        return {"PartNumber": number}
+
+    def complete_upload(self, key: str, upload_id: str, parts: list[dict]):
+        directory = self._parts_directory(upload_id)
+        partial = self.root / f".{key}.{upload_id}"
+        with _local_errors():
+            with open(partial, "wb") as destination:
+                for part in parts:
+                    with open(directory / f"{part['PartNumber']:05d}", "rb") as source:
+                        shutil.copyfileobj(source, destination)
+            os.replace(partial, self.root / key)
+            shutil.rmtree(directory)
+
+    def abort_upload(self, key: str, upload_id: str):
+        shutil.rmtree(self._parts_directory(upload_id), ignore_errors=True)
+
+    def _parts_directory(self, upload_id: str) -> Path:
+        return self.root / ".uploads" / upload_id
+
+
+@dataclass
+class UploadResult:
+    key: str
+    size: int
+    sha256: str
+
+
+async def upload_stream(
+    storage,
+    key: str,
+    chunks: AsyncIterator[bytes],
+    part_size: int,
+    concurrency: int,
+) -> UploadResult:
+    """Upload a stream to storage as a multipart upload, sending parts concurrently.
+
+    The size and SHA-256 checksum are computed as the stream is read. At most
+    concurrency parts are held in memory at once, which also applies
+    backpressure to the incoming stream.
+    """
+    upload_id = await asyncio.to_thread(storage.start_upload, key)
+    slots = asyncio.Semaphore(concurrency)
+    checksum = hashlib.sha256()
+    size = 0
+    uploads = []
+
+    async def send_part(number: int, data: bytes) -> dict:
+        try:
+            return await asyncio.to_thread(
+                storage.upload_part, key, upload_id, number, data
+            )
+        finally:
+            slots.release()
+
+    async def queue_part(data: bytes):
+        await slots.acquire()
+        uploads.append(asyncio.create_task(send_part(len(uploads) + 1, data)))
+
+    try:
+        buffer = bytearray()
+        async for chunk in chunks:
+            checksum.update(chunk)
+            size += len(chunk)
+            buffer += chunk
+            while len(buffer) >= part_size:
+                await queue_part(bytes(buffer[:part_size]))
+                del buffer[:part_size]
+        # The last part may be short, and an empty stream still needs one part
+        if buffer or not uploads:
+            await queue_part(bytes(buffer))
+        parts = await asyncio.gather(*uploads)
+        await asyncio.to_thread(storage.complete_upload, key, upload_id, parts)
+    except BaseException:
+        for upload in uploads:
+            upload.cancel()
+        await asyncio.gather(*uploads, return_exceptions=True)
+        await asyncio.to_thread(storage.abort_upload, key, upload_id)
+        raise
+    return UploadResult(key=key, size=size, sha256=checksum.hexdigest())
+
+
+class DiskCache:
+    """A size-bounded, read-through cache of storage objects on local disk.
+
+    Objects missing from the cache are fetched into the cache directory in the
+    background, and later requests are served from there. Once the cache grows
+    beyond max_bytes the least recently used objects are evicted.
+
+    The directory itself is the index, so several worker processes can share
+    it: each sees the objects the others have cached, and the size bound
+    applies to the directory as a whole. Files are marked as used by setting
+    their access time, which leaves their modification time, and so their
+    ETag, alone.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, storage):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.storage = storage
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._prefetches: dict[str, asyncio.Task] = {}
+
+    def open(self, key: str) -> BinaryIO | None:
+        """Open the cached copy of an object, or return None if it isn't cached.
+
+        Evicting or discarding an object only unlinks its file, so a copy
+        that's already open stays readable until it's closed.
+        """
+        try:
+            file = open(self._path(key), "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self._touch(file.fileno())
+        self.hits += 1
+        return file
+
+    async def fill(self, key: str):
+        """Fetch an object into the cache, unless it's already there."""
+        path = self._path(key)
+        # Only fetch each object once per process, however many requests
+        # arrive for it
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            try:
+                if path.exists():
+                    return
+                self.directory.mkdir(parents=True, exist_ok=True)
+                # Unique to this fill, as other processes may be fetching it too
+                partial = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+                try:
+                    await asyncio.to_thread(self.storage.download, key, partial)
+                    os.replace(partial, path)
+                finally:
+                    partial.unlink(missing_ok=True)
+                self._touch(path)
+            finally:
+                self._locks.pop(key, None)
+        await asyncio.to_thread(self._evict)
+
+    def prefetch(self, key: str):
+        """Start filling the cache with an object, without waiting for it."""
+        if key in self._prefetches:
+            return
+        # The task is referenced until it's done, so it isn't garbage collected
+        self._prefetches[key] = asyncio.create_task(self._prefetch(key))
+
+    async def _prefetch(self, key: str):
+        try:
+            await self.fill(key)
+        except FileNotFoundError:
+            logger.warning("Couldn't cache %s: not found in storage", key)
+        except Exception:
+            logger.exception("Couldn't cache %s", key)
+        finally:
+            self._prefetches.pop(key, None)
+
+    def discard(self, key: str):
+        """Drop a cached object, e.g. because it has been replaced in storage."""
+        self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        files = self._files()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(files),
+            "size": sum(stat.st_size for _, stat in files),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.directory / quote(key, safe="")
+
+    @staticmethod
+    def _touch(file: int | Path):
+        """Mark a cached file, or an open file descriptor, as just used."""
+        try:
+            # Set explicitly rather than left to the filesystem, whose coarser
+            # clock and relatime updates would muddle the order
+            os.utime(file, ns=(time.time_ns(), os.stat(file).st_mtime_ns))
+        except OSError:
+            # Only affects which objects are evicted first
+            pass
+
+    def _files(self) -> list[tuple[Path, os.stat_result]]:
+        """The cached files, least recently used first."""
+        files = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return files
+        for entry in entries:
+            # Dot files are partial downloads
+            if entry.name.startswith("."):
+                continue
+            try:
+                files.append((Path(entry.path), entry.stat()))
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                continue
+        files.sort(key=lambda file: file[1].st_atime_ns)
+        return files
+
+    def _evict(self):
+        files = self._files()
+        size = sum(stat.st_size for _, stat in files)
+        # Always keep the most recent object, even if it alone exceeds the limit
+        for path, stat in files[:-1]:
+            if size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+            self.evictions += 1
+
+
+def get_storage():
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.local_storage_root)
+    return S3Storage(settings.s3_bucket)
+
+
+storage = get_storage()
+
+download_cache = (
+    DiskCache(
+        directory=settings.download_cache_directory,
+        max_bytes=settings.download_cache_max_bytes,
+        storage=storage,
+    )
+    if settings.download_cache_directory
+    else None
+)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+# Settings are read when saluki is imported, so point it at throwaway resources
+# before any test module imports it
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='saluki-tests-'), 'test.db')}",
+)
+os.environ.setdefault("EMAIL_BACKEND", "stub")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def database():
+    """Empty tables for the test, dropped again afterwards."""
+    from saluki import models  # noqa: F401
+    from saluki.dependencies.database import Base, engine
+    from saluki.models import catalogue_version
+    from saluki.utils.cache import token_cache
+
+    Base.metadata.create_all(engine)
+    # Forget anything cached from an earlier test's database
+    catalogue_version.expire()
+    token_cache.clear()
+    try:
+        yield engine
+    finally:
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def auth_headers(database):
+    """Authorization headers for a user at each access level."""
+    from saluki.dependencies.database import DBSession
+    from saluki.dependencies.security import create_access_token
+    from saluki.enums import UserLevel
+    from saluki.models import DBUser
+
+    headers = {}
+    with DBSession() as db:
+        for level in UserLevel:
+            user = DBUser(
+                email=f"{level.name}@example.org",
+                name=level.name,
+                password="-",
+                user_level=level,
+                is_active=True,
+            )
+            db.add(user)
+            db.flush()
+            headers[level] = {"Authorization": f"Bearer {create_access_token(user)}"}
+        db.commit()
+    return headers
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from saluki.main import app
+
+    return TestClient(app)
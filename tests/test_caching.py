@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from saluki.dependencies import security
+from saluki.dependencies.database import AsyncDBSession, DBSession
+from saluki.enums import UserLevel
+from saluki.models import DBCatalogueVersion, DBDataFile, DBUser
+from saluki.models.catalogue import bump_catalogue_version
+
+# The app imports its routers as top level modules, so patch those
+from routers import datafiles  # noqa: E402 isort: skip
+
+
+def datafile(slug: str) -> dict:
+    return {
+        "slug": slug,
+        "description": f"Data file {slug}",
+        "type": "Monthly",
+        "record_count": 10,
+        "start_date": "2024-01-01",
+        "end_date": "2024-01-31",
+        "status": "Available",
+        "location": f"https://example.org/{slug}.json",
+    }
+
+
+@pytest.fixture
+def editor(auth_headers):
+    return auth_headers[UserLevel.editor]
+
+
+def etag(client, headers, path="/datafiles/") -> str:
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def test_matching_etags_are_not_modified(client, editor):
+    client.post("/datafiles/", json=datafile("a"), headers=editor)
+    for path in ("/datafiles/", "/datafiles/a"):
+        tag = etag(client, editor, path)
+        for if_none_match in (tag, f'"other", {tag}', "*"):
+            response = client.get(
+                path, headers={**editor, "If-None-Match": if_none_match}
+            )
+            assert response.status_code == 304
+            assert response.headers["ETag"] == tag
+            assert response.content == b""
+        response = client.get(path, headers={**editor, "If-None-Match": '"other"'})
+        assert response.status_code == 200
+
+
+def test_not_modified_responses_skip_the_route(client, editor, monkeypatch):
+    client.post("/datafiles/", json=datafile("a"), headers=editor)
+    tags = {
+        path: etag(client, editor, path) for path in ("/datafiles/", "/datafiles/a")
+    }
+
+    async def fail(**kwargs):
+        raise AssertionError("data files were loaded")
+
+    monkeypatch.setattr(datafiles, "list_datafiles", fail)
+    monkeypatch.setattr(datafiles, "list_datafile_rows", fail)
+    monkeypatch.setattr(security, "list_datafile", fail)
+    for path, tag in tags.items():
+        response = client.get(path, headers={**editor, "If-None-Match": tag})
+        assert response.status_code == 304
+
+
+def test_etags_change_with_the_catalogue(client, auth_headers, editor):
+    staff = auth_headers[UserLevel.staff]
+    tags = [etag(client, editor)]
+
+    client.post("/datafiles/", json=datafile("a"), headers=editor)
+    tags.append(etag(client, editor))
+
+    with DBSession() as db:
+        user_id = db.scalar(
+            select(DBUser.id).where(DBUser.user_level == UserLevel.user)
+        )
+        datafile_id = db.scalar(select(DBDataFile.id))
+    response = client.post(
+        "/permissions/",
+        json={"user_id": user_id, "data_file_id": datafile_id},
+        headers=staff,
+    )
+    assert response.status_code == 201
+    tags.append(etag(client, editor))
+
+    response = client.put(
+        "/users/user@example.org",
+        json={"email": "user@example.org", "name": "Renamed"},
+        headers=staff,
+    )
+    assert response.status_code == 200
+    tags.append(etag(client, editor))
+
+    assert len(set(tags)) == len(tags)
+
+
+def test_new_databases_have_a_catalogue_version(database):
+    with DBSession() as db:
+        assert db.scalar(select(DBCatalogueVersion.version)) == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_first_bumps(database):
+    async def bump():
+        async with AsyncDBSession() as db:
+            await bump_catalogue_version(db=db)
+            await db.commit()
+
+    await asyncio.gather(*(bump() for _ in range(5)))
+    with DBSession() as db:
+        assert db.scalars(select(DBCatalogueVersion.version)).all() == [6]
@@ -0,0 +1,140 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from saluki.dependencies.database import DBSession
+from saluki.enums import UserLevel
+from saluki.models import DBDataFile, DBDataFilePermission, DBUser
+from saluki.schemas.permissions import DataFilePermission
+from saluki.utils.permissions import permission_index
+
+# The app imports its routers as top level modules, so patch those
+from routers import datafiles  # noqa: E402 isort: skip
+
+
+def datafile(slug: str, **fields) -> dict:
+    return {
+        "slug": slug,
+        "description": f"Data file {slug}",
+        "type": "Monthly",
+        "record_count": 10,
+        "start_date": "2024-01-01",
+        "end_date": "2024-01-31",
+        "status": "Available",
+        "location": f"https://example.org/{slug}.json",
+        **fields,
+    }
+
+
+@pytest.fixture
+def editor(auth_headers):
+    return auth_headers[UserLevel.editor]
+
+
+def test_create_existing_slug_conflicts(client, editor):
+    assert client.post("/datafiles/", json=datafile("a"), headers=editor).is_success
+    response = client.post("/datafiles/", json=datafile("a"), headers=editor)
+    assert response.status_code == 409
+
+
+def test_bulk_creates_and_updates(client, editor):
+    client.post("/datafiles/", json=datafile("a"), headers=editor)
+    response = client.post(
+        "/datafiles/bulk",
+        json=[datafile("a", record_count=20), datafile("b")],
+        headers=editor,
+    )
+    assert response.status_code == 200
+    assert [(r["slug"], r["created"]) for r in response.json()] == [
+        ("a", False),
+        ("b", True),
+    ]
+    assert client.get("/datafiles/a", headers=editor).json()["record_count"] == 20
+
+
+def test_bulk_other_integrity_errors_are_unprocessable(client, editor, monkeypatch):
+    async def upsert_datafiles(**kwargs):
+        raise IntegrityError(
+            "INSERT", {}, sqlite3.IntegrityError("CHECK constraint failed: dates")
+        )
+
+    monkeypatch.setattr(datafiles, "upsert_datafiles", upsert_datafiles)
+    response = client.post("/datafiles/bulk", json=[datafile("a")], headers=editor)
+    assert response.status_code == 422
+
+
+def test_bulk_slug_integrity_errors_conflict(client, editor, monkeypatch):
+    async def upsert_datafiles(**kwargs):
+        raise IntegrityError(
+            "INSERT",
+            {},
+            sqlite3.IntegrityError("UNIQUE constraint failed: datafiles.slug"),
+        )
+
+    monkeypatch.setattr(datafiles, "upsert_datafiles", upsert_datafiles)
+    response = client.post("/datafiles/bulk", json=[datafile("a")], headers=editor)
+    assert response.status_code == 409
+
+
+@pytest.mark.parametrize("datafile_status", ["Deleted", "Hidden", "Generating"])
+def test_only_editors_list_unavailable_datafiles(
+    client, auth_headers, editor, datafile_status
+):
+    client.post(
+        "/datafiles/", json=datafile("a", status=datafile_status), headers=editor
+    )
+    path = f"/datafiles/?status={datafile_status}"
+    response = client.get(path, headers=auth_headers[UserLevel.user])
+    assert response.status_code == 403
+    response = client.get(path, headers=editor)
+    assert [datafile["slug"] for datafile in response.json()] == ["a"]
+    # Non-editors may still ask for available files explicitly
+    response = client.get(
+        "/datafiles/?status=Available", headers=auth_headers[UserLevel.user]
+    )
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def ready_index(monkeypatch):
+    """An empty permission index that's ready to answer access checks."""
+    monkeypatch.setattr(permission_index, "_datafiles", {})
+    monkeypatch.setattr(permission_index, "_types", {})
+    monkeypatch.setattr(permission_index, "built_at", time.monotonic())
+    return permission_index
+
+
+def test_grants_missing_from_the_index_are_checked(
+    client, auth_headers, editor, ready_index
+):
+    client.post("/datafiles/", json=datafile("a"), headers=editor)
+    user = auth_headers[UserLevel.user]
+    path = "/datafiles/a"
+    assert client.get(path, headers=user).status_code == 403
+
+    # Granted by another worker, so the index hasn't seen it
+    with DBSession() as db:
+        user_id = db.scalar(
+            select(DBUser.id).where(DBUser.user_level == UserLevel.user)
+        )
+        datafile_id = db.scalar(select(DBDataFile.id))
+        db.add(DBDataFilePermission(user_id=user_id, data_file_id=datafile_id))
+        db.commit()
+    assert client.get(path, headers=user).status_code == 200
+
+
+def test_grants_in_the_index_skip_the_database(
+    client, auth_headers, editor, ready_index
+):
+    client.post("/datafiles/", json=datafile("a"), headers=editor)
+    with DBSession() as db:
+        user_id = db.scalar(
+            select(DBUser.id).where(DBUser.user_level == UserLevel.user)
+        )
+        datafile_id = db.scalar(select(DBDataFile.id))
+    ready_index.grant(DataFilePermission(user_id=user_id, data_file_id=datafile_id))
+    response = client.get("/datafiles/a", headers=auth_headers[UserLevel.user])
+    assert response.status_code == 200
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+
+from saluki.utils.email import EmailOutbox, StubMailTransport
+
+pytestmark = pytest.mark.anyio
+
+
+def make_outbox(transport, **options) -> EmailOutbox:
+    return EmailOutbox(
+        concurrency=options.get("concurrency", 2),
+        batch_size=options.get("batch_size", 10),
+        max_retries=options.get("max_retries", 2),
+        retry_backoff=0,
+        transport=transport,
+    )
+
+
+def message(to: str) -> dict:
+    return {"from": "test@example.org", "to": to, "subject": "Hi", "text": "Hello"}
+
+
+async def test_delivers_messages():
+    transport = StubMailTransport()
+    outbox = make_outbox(transport)
+    outbox.send(message("a@example.org"))
+    outbox.send(message("b@example.org"))
+    await outbox.flush()
+    assert [sent["to"] for sent in transport.sent] == ["a@example.org", "b@example.org"]
+    await outbox.close()
+
+
+async def test_retries_server_errors():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"message": "Queued"})
+
+    outbox = make_outbox(httpx.MockTransport(handler))
+    outbox.send(message("a@example.org"))
+    await outbox.flush()
+    assert len(attempts) == 3
+    await outbox.close()
+
+
+async def test_does_not_retry_client_errors():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(400, json={"message": "Bad address"})
+
+    outbox = make_outbox(httpx.MockTransport(handler))
+    outbox.send(message("bad"))
+    await outbox.flush()
+    assert len(attempts) == 1
+    await outbox.close()
+
+
+async def test_survives_a_response_that_is_not_json():
+    delivered = []
+
+    def handler(request):
+        delivered.append(request)
+        if len(delivered) == 1:
+            return httpx.Response(200, text="not json")
+        return httpx.Response(200, json={"message": "Queued"})
+
+    outbox = make_outbox(httpx.MockTransport(handler), batch_size=1)
+    outbox.send(message("a@example.org"))
+    await asyncio.wait_for(outbox.flush(), timeout=5)
+    outbox.send(message("b@example.org"))
+    await asyncio.wait_for(outbox.flush(), timeout=5)
+    assert len(delivered) == 2
+    assert not outbox._worker.done()
+    await outbox.close()
+
+
+async def test_restarts_a_stopped_worker():
+    transport = StubMailTransport()
+    outbox = make_outbox(transport)
+    outbox.send(message("a@example.org"))
+    await outbox.flush()
+    outbox._worker.cancel()
+    await asyncio.sleep(0)
+    outbox.send(message("b@example.org"))
+    await asyncio.wait_for(outbox.flush(), timeout=5)
+    assert len(transport.sent) == 2
+    await outbox.close()
+
+
+async def test_close_drains_the_queue():
+    transport = StubMailTransport()
+    outbox = make_outbox(transport, batch_size=3)
+    for i in range(10):
+        outbox.send(message(f"{i}@example.org"))
+    await asyncio.wait_for(outbox.close(), timeout=5)
+    assert len(transport.sent) == 10
+    assert outbox.queue_depth == 0
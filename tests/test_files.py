@@ -0,0 +1,121 @@
+import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from saluki.config import settings
+from saluki.dependencies.database import DBSession
+from saluki.enums import DataFileStatus, DataFileType, UserLevel
+from saluki.models import DBDataFile
+from saluki.utils.files import etag_matches, parse_range
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=900-", (900, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        # Invalid or unsupported ranges are ignored
+        ("bytes=500-100", None),
+        ("bytes=0-1,5-6", None),
+        ("bytes=-", None),
+        ("bytes=a-b", None),
+        ("bytes=1--5", None),
+        ("lines=0-5", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(HTTPException) as raised:
+        parse_range(header, SIZE)
+    assert raised.value.status_code == 416
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", W/"abc"', True),
+        ("*", True),
+        ('"xyz"', False),
+        ('"abcd"', False),
+        ("", False),
+    ],
+)
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+@pytest.fixture
+def local_datafile(tmp_path, monkeypatch, auth_headers):
+    monkeypatch.setattr(settings, "local_data_root", str(tmp_path))
+    path = tmp_path / "data.json"
+    path.write_bytes(bytes(range(256)) * 4)
+    with DBSession() as db:
+        db.add(
+            DBDataFile(
+                slug="local",
+                description="A local data file",
+                type=DataFileType.other,
+                record_count=0,
+                start_date=datetime.date(2024, 1, 1),
+                end_date=datetime.date(2024, 1, 31),
+                status=DataFileStatus.active,
+                location=path.as_uri(),
+            )
+        )
+        db.commit()
+    return path.read_bytes(), auth_headers[UserLevel.editor]
+
+
+def test_download_and_head(client, local_datafile):
+    data, headers = local_datafile
+    response = client.get("/datafiles/local/download", headers=headers)
+    assert response.status_code == 200
+    assert response.content == data
+
+    head = client.head("/datafiles/local/download", headers=headers)
+    assert head.status_code == 200
+    assert head.content == b""
+    assert head.headers["Content-Length"] == str(len(data))
+    assert head.headers["ETag"] == response.headers["ETag"]
+
+
+def test_conditional_download(client, local_datafile):
+    data, headers = local_datafile
+    etag = client.head("/datafiles/local/download", headers=headers).headers["ETag"]
+    for if_none_match in (etag, f'"other", W/{etag}', "*"):
+        response = client.get(
+            "/datafiles/local/download",
+            headers={**headers, "If-None-Match": if_none_match},
+        )
+        assert response.status_code == 304
+    response = client.get(
+        "/datafiles/local/download", headers={**headers, "If-None-Match": '"other"'}
+    )
+    assert response.status_code == 200
+
+
+def test_range_download(client, local_datafile):
+    data, headers = local_datafile
+    response = client.get(
+        "/datafiles/local/download", headers={**headers, "Range": "bytes=10-19"}
+    )
+    assert response.status_code == 206
+    assert response.content == data[10:20]
+
+    response = client.get(
+        "/datafiles/local/download", headers={**headers, "Range": "bytes=500-100"}
+    )
+    assert response.status_code == 200
+    assert response.content == data
@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, StaticPool
+
+from saluki.dependencies.database import async_engine
+from saluki.utils.metrics import registry
+
+
+def connect():
+    raise AssertionError("the pool shouldn't connect")
+
+
+@pytest.mark.parametrize("pool_class", [StaticPool, NullPool])
+def test_pools_without_counts_are_skipped(monkeypatch, pool_class):
+    monkeypatch.setattr(async_engine.sync_engine, "pool", pool_class(connect))
+    assert "saluki_db_pool_connections{" not in registry.render()
+
+
+def test_queue_pool_connections(monkeypatch):
+    pool = AsyncAdaptedQueuePool(connect, pool_size=3)
+    monkeypatch.setattr(async_engine.sync_engine, "pool", pool)
+    assert 'saluki_db_pool_connections{state="size"} 3.0' in registry.render()
@@ -0,0 +1,21 @@
+import os
+import signal
+
+import pytest
+
+from saluki.utils.passwords import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_recovers_from_a_crashed_worker():
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+    try:
+        hashed = await hasher.hash("secret")
+        for process in list(hasher._executor._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+        assert await hasher.verify("secret", hashed)
+        assert hasher.in_flight == 0
+    finally:
+        hasher.shutdown()
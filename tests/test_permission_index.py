@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from saluki.dependencies.database import AsyncDBSession, DBSession
+from saluki.enums import DataFileType
+from saluki.models import DBDataFile, DBDataFilePermission, DBDataFileTypePermission
+from saluki.schemas.permissions import DataFilePermission, DataFileTypePermission
+from saluki.utils import permissions
+from saluki.utils.permissions import PermissionIndex, refresh_permission_index
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def grants(database):
+    with DBSession() as db:
+        db.add_all(
+            DBDataFilePermission(user_id=user_id, data_file_id=datafile_id)
+            for user_id in range(1, 51)
+            for datafile_id in range(1, 21)
+        )
+        db.add(DBDataFileTypePermission(user_id=1, data_file_type=DataFileType.corpus))
+        db.commit()
+
+
+async def test_rebuild_yields_between_batches(grants, monkeypatch):
+    monkeypatch.setattr(permissions, "REBUILD_BATCH_SIZE", 100)
+    index = PermissionIndex()
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    ticker = asyncio.create_task(tick())
+    async with AsyncDBSession() as db:
+        await index.rebuild(db)
+    ticker.cancel()
+
+    assert ticks > 10
+    assert index.ready
+    assert index.can_access(50, DBDataFile(id=20, type=DataFileType.monthly))
+    assert not index.can_access(50, DBDataFile(id=21, type=DataFileType.monthly))
+    assert index.can_access(1, DBDataFile(id=99, type=DataFileType.corpus))
+    assert not index.can_access(99, DBDataFile(id=1, type=DataFileType.monthly))
+
+
+async def test_changes_during_a_rebuild_are_kept(grants, monkeypatch):
+    monkeypatch.setattr(permissions, "REBUILD_BATCH_SIZE", 100)
+    index = PermissionIndex()
+    applied_during_rebuild = False
+
+    async def change():
+        nonlocal applied_during_rebuild
+        while index._pending is None:
+            await asyncio.sleep(0)
+        index.grant(DataFilePermission(user_id=99, data_file_id=5))
+        index.revoke(DataFilePermission(user_id=3, data_file_id=1))
+        index.revoke(
+            DataFileTypePermission(user_id=1, data_file_type=DataFileType.corpus)
+        )
+        index.forget_user(2)
+        applied_during_rebuild = index._pending is not None
+
+    changer = asyncio.create_task(change())
+    async with AsyncDBSession() as db:
+        await index.rebuild(db)
+    await changer
+
+    assert applied_during_rebuild
+    # The rebuild read the database before the changes, but they're replayed
+    assert index.can_access(99, DBDataFile(id=5, type=DataFileType.monthly))
+    assert not index.can_access(3, DBDataFile(id=1, type=DataFileType.monthly))
+    assert index.can_access(3, DBDataFile(id=2, type=DataFileType.monthly))
+    assert not index.can_access(1, DBDataFile(id=99, type=DataFileType.corpus))
+    assert not index.can_access(2, DBDataFile(id=1, type=DataFileType.monthly))
+    assert index._pending is None
+
+
+async def test_refresh_keeps_going_after_errors(monkeypatch, caplog):
+    calls = 0
+    recovered = asyncio.Event()
+
+    async def rebuild():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("unexpected")
+        recovered.set()
+
+    monkeypatch.setattr(permissions, "rebuild_permission_index", rebuild)
+    refresh = asyncio.create_task(refresh_permission_index(0))
+    await asyncio.wait_for(recovered.wait(), timeout=5)
+    refresh.cancel()
+
+    assert "Couldn't rebuild the permission index" in caplog.text
@@ -0,0 +1,85 @@
+import datetime
+
+import pytest
+from sqlalchemy import event, func, select
+
+from saluki.dependencies.database import AsyncDBSession, DBSession, async_engine
+from saluki.enums import DataFileStatus, DataFileType, UserLevel
+from saluki.models import DBDataFile, DBDataFilePermission, DBUser
+from saluki.models.permissions import create_permissions, remove_permissions
+from saluki.schemas.permissions import DataFilePermission
+
+pytestmark = pytest.mark.anyio
+
+USERS = 25
+DATAFILES = 1000
+# The lowest limit on bound parameters per statement, from SQLite
+MAX_PARAMETERS = 32_766
+
+
+@pytest.fixture
+def catalogue(database):
+    with DBSession() as db:
+        db.add_all(
+            DBUser(
+                email=f"user-{i}@example.org",
+                name=f"User {i}",
+                password="-",
+                user_level=UserLevel.user,
+                is_active=True,
+            )
+            for i in range(USERS)
+        )
+        db.add_all(
+            DBDataFile(
+                slug=f"datafile-{i}",
+                description=f"Data file {i}",
+                type=DataFileType.monthly,
+                record_count=0,
+                start_date=datetime.date(2020, 1, 1),
+                end_date=datetime.date(2020, 1, 31),
+                status=DataFileStatus.active,
+            )
+            for i in range(DATAFILES)
+        )
+        db.commit()
+        user_ids = db.scalars(select(DBUser.id)).all()
+        datafile_ids = db.scalars(select(DBDataFile.id)).all()
+    return user_ids, datafile_ids
+
+
+@pytest.fixture
+def parameter_counts():
+    counts = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts.append(len(parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    yield counts
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+
+async def test_bulk_changes_stay_under_the_parameter_limit(catalogue, parameter_counts):
+    user_ids, datafile_ids = catalogue
+    # Two columns per row, so 25,000 rows in one statement would be over the limit
+    permissions = [
+        DataFilePermission(user_id=user_id, data_file_id=datafile_id)
+        for user_id in user_ids
+        for datafile_id in datafile_ids
+    ]
+
+    async with AsyncDBSession() as db:
+        created = await create_permissions(db=db, permission_dicts=permissions)
+        assert len(created) == len(permissions)
+        # Granting again skips the existing rows
+        assert await create_permissions(db=db, permission_dicts=permissions) == []
+
+        count = select(func.count()).select_from(DBDataFilePermission)
+        assert await db.scalar(count) == len(permissions)
+
+        removed = await remove_permissions(db=db, permission_dicts=permissions)
+        assert removed == len(permissions)
+        assert await db.scalar(count) == 0
+
+    assert max(parameter_counts) < MAX_PARAMETERS
@@ -0,0 +1,82 @@
+import datetime
+import re
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from saluki.config import settings
+from saluki.dependencies.database import AsyncDBSession, DBSession
+from saluki.enums import DataFileStatus, DataFileType, UserLevel
+from saluki.models import DBDataFile, DBDataFileTypePermission, DBUser
+from saluki.utils.queries import QueryBudgetExceeded, QueryCounterMiddleware
+
+DATAFILES = 30
+
+
+@pytest.fixture
+def strict(monkeypatch):
+    monkeypatch.setattr(settings, "query_budget_strict", True)
+
+
+@pytest.fixture
+def catalogue(auth_headers):
+    with DBSession() as db:
+        db.add_all(
+            DBDataFile(
+                slug=f"datafile-{i}",
+                description=f"Data file {i}",
+                type=DataFileType.monthly,
+                record_count=i,
+                start_date=datetime.date(2024, 1, 1),
+                end_date=datetime.date(2024, 1, 31),
+                status=DataFileStatus.active,
+                location=f"s3://bucket/datafile-{i}.json",
+            )
+            for i in range(DATAFILES)
+        )
+        user = db.scalar(select(DBUser).where(DBUser.user_level == UserLevel.user))
+        db.add(
+            DBDataFileTypePermission(
+                user_id=user.id, data_file_type=DataFileType.monthly
+            )
+        )
+        db.commit()
+    return auth_headers
+
+
+def query_count(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["Server-Timing"])[1])
+
+
+@pytest.mark.parametrize("level", [UserLevel.user, UserLevel.editor])
+@pytest.mark.parametrize(
+    "path",
+    ["/datafiles/", "/datafiles/?include=download_link", "/datafiles/datafile-3"],
+)
+def test_datafile_routes_stay_in_budget(strict, client, catalogue, level, path):
+    # Strict mode fails the request if any statement is repeated per data file
+    response = client.get(path, headers=catalogue[level])
+    assert response.status_code == 200
+    if path == "/datafiles/":
+        assert len(response.json()) == DATAFILES
+    # Authentication, access checks and the data files themselves, whether or
+    # not the user and catalogue version are already cached
+    assert query_count(response) <= 4
+
+
+def test_n_plus_one_queries_fail_in_strict_mode(strict, catalogue):
+    app = FastAPI()
+    app.add_middleware(QueryCounterMiddleware)
+
+    @app.get("/slugs")
+    async def slugs():
+        async with AsyncDBSession() as db:
+            # Few enough queries to be in budget, but too many of the same one
+            ids = (await db.scalars(select(DBDataFile.id).limit(10))).all()
+            # One query per data file, as a lazy relationship in a loop would run
+            return [(await db.get(DBDataFile, id)).slug for id in ids]
+
+    with pytest.raises(QueryBudgetExceeded, match="ran the same statement 10 times"):
+        TestClient(app).get("/slugs")
@@ -0,0 +1,55 @@
+import logging
+
+from botocore.exceptions import ClientError
+
+from saluki.utils.s3 import S3Presigner, presigner
+from saluki.utils.storage import S3Storage
+
+
+class FakeClient:
+    def __init__(self, error: bool = False):
+        self.error = error
+        self.calls = 0
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        self.calls += 1
+        if self.error:
+            raise ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+        return f"https://example.org/{Params['Key']}?signature={self.calls}"
+
+
+def make_presigner(client, cache_size=10) -> S3Presigner:
+    presigner = S3Presigner(
+        bucket="bucket", expires_in=3600, refresh_margin=300, cache_size=cache_size
+    )
+    presigner._client = client
+    return presigner
+
+
+def test_reuses_cached_urls():
+    client = FakeClient()
+    presigner = make_presigner(client)
+    assert presigner.presign("a") == presigner.presign("a")
+    assert client.calls == 1
+
+
+def test_cache_is_bounded():
+    client = FakeClient()
+    presigner = make_presigner(client, cache_size=2)
+    for key in ("a", "b", "c"):
+        presigner.presign(key)
+    assert len(presigner._urls) == 2
+    # The least recently used URL was dropped, so it is signed again
+    presigner.presign("a")
+    assert client.calls == 4
+
+
+def test_logs_signing_errors(caplog):
+    presigner = make_presigner(FakeClient(error=True))
+    with caplog.at_level(logging.WARNING, logger="saluki.utils.s3"):
+        assert presigner.presign("a") is None
+    assert "Couldn't generate presigned URL for a" in caplog.text
+
+
+def test_storage_and_presigner_share_a_client():
+    assert S3Storage("bucket").client is presigner.client
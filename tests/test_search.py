@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import select
+
+from saluki.dependencies.database import DBSession
+from saluki.enums import UserLevel
+from saluki.models import DBDataFile, DBDataFilePermission, DBUser
+from saluki.models.datafiles import search_terms
+
+
+@pytest.mark.parametrize(
+    "q, terms",
+    [
+        ("crossref", '"crossref"*'),
+        ("monthly crossref", '"monthly" "crossref"*'),
+        ('say "hello"', '"say" "hello"*'),
+        ('"unbalanced', '"unbalanced"*'),
+        ("o'brien", '"o" "brien"*'),
+        ("!!! ... ---", ""),
+        ("", ""),
+    ],
+)
+def test_search_terms(q, terms):
+    assert search_terms(q) == terms
+
+
+def datafile(slug: str, description: str, **fields) -> dict:
+    return {
+        "slug": slug,
+        "description": description,
+        "type": "Monthly",
+        "record_count": 10,
+        "start_date": "2024-01-01",
+        "end_date": "2024-01-31",
+        "status": "Available",
+        "location": f"https://example.org/{slug}.json",
+        **fields,
+    }
+
+
+@pytest.fixture
+def editor(auth_headers):
+    return auth_headers[UserLevel.editor]
+
+
+def search(client, headers, q: str, **params) -> list[str]:
+    response = client.get("/datafiles/", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return sorted(datafile["slug"] for datafile in response.json())
+
+
+def test_index_follows_inserts_and_updates(client, editor):
+    client.post("/datafiles/", json=datafile("a", "Crossref works"), headers=editor)
+    assert search(client, editor, "crossref") == ["a"]
+    assert search(client, editor, "cross") == ["a"]
+
+    client.put("/datafiles/a", json=datafile("a", "DataCite dois"), headers=editor)
+    assert search(client, editor, "crossref") == []
+    assert search(client, editor, "datacite") == ["a"]
+
+    # Bulk updates go through an ORM bulk UPDATE rather than per object
+    response = client.post(
+        "/datafiles/bulk",
+        json=[datafile("a", "ORCID records"), datafile("b", "Crossref members")],
+        headers=editor,
+    )
+    assert response.status_code == 200
+    assert search(client, editor, "datacite") == []
+    assert search(client, editor, "orcid") == ["a"]
+    assert search(client, editor, "crossref") == ["b"]
+
+
+@pytest.mark.parametrize(
+    "q, found",
+    [("!!!", []), ('"', []), ("'\"*()", []), ('crossref"', ["a"]), ('"works', ["a"])],
+)
+def test_punctuation_and_quotes(client, editor, q, found):
+    client.post("/datafiles/", json=datafile("a", "Crossref works"), headers=editor)
+    assert search(client, editor, q) == found
+
+
+def test_search_only_finds_accessible_available_files(client, auth_headers, editor):
+    for slug, status in (("granted", "Available"), ("deleted", "Deleted")):
+        client.post(
+            "/datafiles/",
+            json=datafile(slug, "Crossref works", status=status),
+            headers=editor,
+        )
+    client.post(
+        "/datafiles/",
+        json=datafile("other", "Crossref works", type="Yearly"),
+        headers=editor,
+    )
+    with DBSession() as db:
+        user_id = db.scalar(
+            select(DBUser.id).where(DBUser.user_level == UserLevel.user)
+        )
+        for slug in ("granted", "deleted"):
+            datafile_id = db.scalar(
+                select(DBDataFile.id).where(DBDataFile.slug == slug)
+            )
+            db.add(DBDataFilePermission(user_id=user_id, data_file_id=datafile_id))
+        db.commit()
+
+    user = auth_headers[UserLevel.user]
+    assert search(client, user, "crossref") == ["granted"]
+    assert search(client, user, "crossref", status="Available") == ["granted"]
+    assert search(client, editor, "crossref") == ["deleted", "granted", "other"]
+
+
+def test_cursors_are_rejected_when_searching(client, editor):
+    client.post("/datafiles/", json=datafile("a", "Crossref works"), headers=editor)
+    client.post("/datafiles/", json=datafile("b", "Crossref works"), headers=editor)
+    first = client.get("/datafiles/", params={"limit": 1}, headers=editor)
+    cursor = first.headers["X-Next-Cursor"]
+    response = client.get(
+        "/datafiles/", params={"q": "crossref", "cursor": cursor}, headers=editor
+    )
+    assert response.status_code == 400
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+import pytest
+
+from saluki.utils.storage import DiskCache, LocalStorage, StorageError
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingStorage(LocalStorage):
+    """Local storage that counts downloads, and can hold them until released."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.downloads = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def download(self, key, destination):
+        self.downloads += 1
+        self.release.wait(timeout=5)
+        super().download(key, destination)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    root = tmp_path / "storage"
+    root.mkdir()
+    for key, size in (("a", 10), ("b", 10), ("c", 10)):
+        (root / key).write_bytes(key.encode() * size)
+    return CountingStorage(root)
+
+
+@pytest.fixture
+def cache(tmp_path, storage):
+    return DiskCache(tmp_path / "cache", max_bytes=25, storage=storage)
+
+
+def read(cache, key):
+    with cache.open(key) as file:
+        return file.read()
+
+
+async def test_miss_then_hit(cache, storage):
+    assert cache.open("a") is None
+    await cache.fill("a")
+    assert read(cache, "a") == b"a" * 10
+    assert read(cache, "a") == b"a" * 10
+    assert storage.downloads == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+async def test_evicts_least_recently_used(cache, storage):
+    await cache.fill("a")
+    await cache.fill("b")
+    # Using a makes b the least recently used
+    read(cache, "a")
+    await cache.fill("c")
+    assert cache.open("b") is None
+    assert read(cache, "a") == b"a" * 10
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 20
+
+
+async def test_open_file_survives_eviction(cache):
+    await cache.fill("a")
+    file = cache.open("a")
+    cache.discard("a")
+    with file:
+        assert file.read() == b"a" * 10
+    assert cache.open("a") is None
+
+
+async def test_concurrent_fills_download_once(cache, storage):
+    storage.release.clear()
+    fills = [asyncio.create_task(cache.fill("a")) for _ in range(5)]
+    await asyncio.sleep(0.1)
+    storage.release.set()
+    await asyncio.gather(*fills)
+    assert storage.downloads == 1
+    assert read(cache, "a") == b"a" * 10
+
+
+async def test_workers_share_the_directory(tmp_path, cache, storage):
+    other_worker = DiskCache(tmp_path / "cache", max_bytes=25, storage=storage)
+    await cache.fill("a")
+    # Cached by another worker, so neither a miss nor another download
+    assert read(other_worker, "a") == b"a" * 10
+    await other_worker.fill("a")
+    assert storage.downloads == 1
+
+    await other_worker.fill("b")
+    await cache.fill("c")
+    # The size bound applies to everything either worker cached
+    assert cache.stats()["size"] == other_worker.stats()["size"] == 20
+    assert cache.open("a") is None
+
+
+async def test_concurrent_fills_across_workers(tmp_path, storage):
+    caches = [
+        DiskCache(tmp_path / "cache", max_bytes=100, storage=storage) for _ in range(3)
+    ]
+    storage.release.clear()
+    fills = [asyncio.create_task(cache.fill("a")) for cache in caches]
+    await asyncio.sleep(0.1)
+    storage.release.set()
+    await asyncio.gather(*fills)
+    # Each worker downloads to its own partial file, so none are corrupted
+    assert read(caches[0], "a") == b"a" * 10
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == ["a"]
+
+
+async def test_prefetch_fills_in_the_background(cache, storage):
+    storage.release.clear()
+    cache.prefetch("a")
+    cache.prefetch("a")
+    assert cache.open("a") is None
+    storage.release.set()
+    while cache._prefetches:
+        await asyncio.sleep(0.01)
+    assert storage.downloads == 1
+    assert read(cache, "a") == b"a" * 10
+
+
+async def test_prefetch_of_missing_object_is_logged(cache, caplog):
+    cache.prefetch("missing")
+    while cache._prefetches:
+        await asyncio.sleep(0.01)
+    assert "Couldn't cache missing" in caplog.text
+    assert cache.open("missing") is None
+
+
+def test_local_storage_errors_are_storage_errors(tmp_path):
+    storage = LocalStorage(tmp_path)
+    (tmp_path / "directory").mkdir()
+    (tmp_path / ".uploads").write_bytes(b"")
+    with pytest.raises(FileNotFoundError):
+        storage.download("missing", tmp_path / "copy")
+    with pytest.raises(StorageError):
+        storage.download("directory", tmp_path / "copy")
+    with pytest.raises(StorageError):
+        storage.start_upload("a")
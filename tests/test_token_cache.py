@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from jose import jwt
+from sqlalchemy import select
+
+from saluki.config import settings
+from saluki.dependencies.database import AsyncDBSession
+from saluki.dependencies.security import create_access_token, get_current_user
+from saluki.enums import UserLevel
+from saluki.models import DBUser
+from saluki.models.users import activate_user, remove_user, update_user
+from saluki.schemas.users import UserUpdate
+from saluki.utils.cache import TTLCache, token_cache
+
+pytestmark = pytest.mark.anyio
+
+
+def test_entries_expire():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("short", 1, ttl=0.05)
+    cache.set("long", 2)
+    assert cache.get("short") == 1
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    # Entries can't outlive the cache's own time to live
+    cache.set("longer", 3, ttl=3600)
+    assert cache._entries["longer"][1] <= time.monotonic() + 60
+    # Nor be stored once already expired
+    cache.set("expired", 4, ttl=-1)
+    assert cache.get("expired") is None
+
+
+def token(user: DBUser, expires_in: float) -> str:
+    return jwt.encode(
+        {"sub": user.email, "action": "api", "exp": time.time() + expires_in},
+        settings.secret_key,
+        algorithm="HS256",
+    )
+
+
+@pytest.fixture
+async def user(auth_headers):
+    async with AsyncDBSession() as db:
+        yield await db.scalar(
+            select(DBUser).where(DBUser.user_level == UserLevel.user)
+        ), db
+
+
+async def test_entries_never_outlive_the_token(user):
+    user, db = user
+    short_lived = token(user, expires_in=2)
+    await get_current_user(db=db, token=short_lived)
+    assert token_cache.get(short_lived) is not None
+    _, expires = token_cache._entries[short_lived]
+    assert expires <= time.monotonic() + 2
+    assert settings.token_cache_seconds > 2
+
+
+async def update(db, user):
+    await update_user(
+        db=db, user=user, user_dict=UserUpdate(email=user.email, name="Renamed")
+    )
+
+
+async def remove(db, user):
+    await remove_user(db=db, user=user)
+
+
+async def activate(db, user):
+    await activate_user(db=db, user=user)
+
+
+@pytest.mark.parametrize("change", [update, remove, activate])
+async def test_changes_evict_cached_tokens(user, change):
+    user, db = user
+    access_token = create_access_token(user)
+    await get_current_user(db=db, token=access_token)
+    assert token_cache.get(access_token) is not None
+
+    await change(db, user)
+    assert token_cache.get(access_token) is None
@@ -0,0 +1,145 @@
+import datetime
+import hashlib
+import os
+
+import pytest
+
+from saluki.config import settings
+from saluki.dependencies.database import DBSession, async_engine
+from saluki.enums import DataFileStatus, DataFileType, UserLevel
+from saluki.models import DBDataFile
+from saluki.utils.storage import LocalStorage, StorageError, upload_stream
+
+# The app imports its routers as top level modules, so patch those
+from routers import datafiles  # noqa: E402 isort: skip
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingStorage(LocalStorage):
+    """Local storage that records calls, and can be made to fail."""
+
+    def __init__(self, root, fail_part=None, fail_complete=False):
+        super().__init__(root)
+        self.fail_part = fail_part
+        self.fail_complete = fail_complete
+        self.parts = []
+        self.aborted = []
+        self.connections_in_use = []
+
+    def upload_part(self, key, upload_id, number, data):
+        self.connections_in_use.append(async_engine.sync_engine.pool.checkedout())
+        if number == self.fail_part:
+            raise StorageError("part failed")
+        self.parts.append((number, len(data)))
+        return super().upload_part(key, upload_id, number, data)
+
+    def complete_upload(self, key, upload_id, parts):
+        if self.fail_complete:
+            raise StorageError("complete failed")
+        super().complete_upload(key, upload_id, parts)
+
+    def abort_upload(self, key, upload_id):
+        self.aborted.append(upload_id)
+        super().abort_upload(key, upload_id)
+
+
+async def chunks(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def test_parts_are_numbered_in_order(tmp_path):
+    storage = RecordingStorage(tmp_path)
+    data = os.urandom(1000)
+    result = await upload_stream(
+        storage, "key", chunks(data), part_size=100, concurrency=3
+    )
+    assert (tmp_path / "key").read_bytes() == data
+    assert sorted(storage.parts) == [(number, 100) for number in range(1, 11)]
+    assert result.size == 1000
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert not (tmp_path / ".uploads").exists() or not any(
+        (tmp_path / ".uploads").iterdir()
+    )
+
+
+async def test_last_part_may_be_short(tmp_path):
+    storage = RecordingStorage(tmp_path)
+    data = os.urandom(250)
+    await upload_stream(storage, "key", chunks(data), part_size=100, concurrency=2)
+    assert sorted(storage.parts) == [(1, 100), (2, 100), (3, 50)]
+    assert (tmp_path / "key").read_bytes() == data
+
+
+async def test_empty_body_is_one_empty_part(tmp_path):
+    storage = RecordingStorage(tmp_path)
+    result = await upload_stream(
+        storage, "key", chunks(b""), part_size=100, concurrency=2
+    )
+    assert storage.parts == [(1, 0)]
+    assert (tmp_path / "key").read_bytes() == b""
+    assert result.size == 0
+    assert result.sha256 == hashlib.sha256(b"").hexdigest()
+
+
+@pytest.mark.parametrize(
+    "failure", [{"fail_part": 3}, {"fail_complete": True}], ids=["part", "complete"]
+)
+async def test_failures_abort_the_upload(tmp_path, failure):
+    storage = RecordingStorage(tmp_path, **failure)
+    with pytest.raises(StorageError):
+        await upload_stream(
+            storage, "key", chunks(os.urandom(1000)), part_size=100, concurrency=2
+        )
+    assert len(storage.aborted) == 1
+    assert not (tmp_path / "key").exists()
+    assert not any((tmp_path / ".uploads").iterdir())
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    storage = RecordingStorage(tmp_path)
+    monkeypatch.setattr(datafiles, "storage", storage)
+    monkeypatch.setattr(settings, "storage_backend", "local")
+    monkeypatch.setattr(settings, "local_storage_root", str(tmp_path))
+    monkeypatch.setattr(settings, "upload_part_size", 100)
+    return storage
+
+
+@pytest.fixture
+def generating_datafile(auth_headers):
+    with DBSession() as db:
+        db.add(
+            DBDataFile(
+                slug="upload",
+                description="A data file to upload",
+                type=DataFileType.other,
+                record_count=0,
+                start_date=datetime.date(2024, 1, 1),
+                end_date=datetime.date(2024, 1, 31),
+                status=DataFileStatus.generating,
+            )
+        )
+        db.commit()
+    return auth_headers[UserLevel.editor]
+
+
+def test_upload_route(client, local_storage, generating_datafile, tmp_path):
+    headers = generating_datafile
+    data = os.urandom(1000)
+    response = client.put(
+        "/datafiles/upload/upload?record_count=5", headers=headers, content=data
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["size"] == 1000
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+    assert body["location"] == (tmp_path / "upload").resolve().as_uri()
+    assert body["status"] == "Available"
+    # No database connection is held while the body is streamed to storage
+    assert set(local_storage.connections_in_use) == {0}
+
+    response = client.get("/datafiles/upload/download", headers=headers)
+    assert response.status_code == 200
+    assert response.content == data